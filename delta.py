@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Delta Playlist Feed
+Compares each run's channel set with the previous one and publishes a
+compact, sequenced delta (added / removed / changed) plus a client-side
+apply helper
+
+Layout of output/delta/:
+  state.json          full snapshot {sequence, generated_at, channels: {id: entry}}
+  index.json          manifest of the retained deltas
+  delta_000042.json   changes from sequence 41 to 42
+
+Usage:
+  python delta.py apply local_state.json output/delta/delta_*.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = "state.json"
+INDEX_NAME = "index.json"
+DEFAULT_KEEP = 20
+
+ENTRY_FIELDS = ("name", "url", "category", "logo", "tvg_id")
+
+
+def channel_identity(channel):
+    """
+    Stable id for a channel across runs. IPTVCat detail pages are per stream and
+    survive token rotation, so they win; otherwise name + stream path (query
+    strings usually carry expiring tokens). Channels reloaded from channels.json
+    carry the id computed when they were scraped.
+    """
+    if channel.get("identity"):
+        return channel["identity"]
+    detail = channel.get("detail_link")
+    if detail:
+        key = "d|" + detail
+    else:
+        url = channel.get("origin_url") or channel.get("stream_url") or ""
+        parts = urlsplit(url)
+        key = f"n|{channel.get('name', '')}|{parts.netloc}{parts.path}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def assign_identities(channels, seen=None):
+    """
+    Set channel["identity"] on every channel that has none. Rows that share a
+    base identity (same name and stream path, no detail link, differing only
+    in the query) get an ordinal suffix in row order instead of overwriting
+    each other. Pass the same seen dict to assign incrementally.
+    """
+    seen = {} if seen is None else seen
+    collisions = 0
+    for ch in channels:
+        if ch.get("identity"):
+            seen[ch["identity"]] = seen.get(ch["identity"], 0) + 1
+            continue
+        base = channel_identity(ch)
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        if n:
+            collisions += 1
+            ch["identity"] = hashlib.sha1(f"{base}#{n}".encode("utf-8")).hexdigest()[:16]
+        else:
+            ch["identity"] = base
+    if collisions:
+        logger.info(f"Delta: {collisions} channels share a name and stream path; told apart by row order")
+    return channels
+
+
+def diff_snapshots(old, new):
+    """Return (added, removed, changed) between two {id: entry} maps"""
+    added = {cid: entry for cid, entry in new.items() if cid not in old}
+    removed = sorted(cid for cid in old if cid not in new)
+    changed = {cid: entry for cid, entry in new.items() if cid in old and old[cid] != entry}
+    return added, removed, changed
+
+
+def apply_delta(snapshot, delta):
+    """
+    Apply one delta to a snapshot {sequence, channels} and return the new one.
+    Raises ValueError if the delta does not follow the snapshot; the client
+    should then download state.json for a full resync.
+    """
+    if delta["base_sequence"] != snapshot.get("sequence", 0):
+        raise ValueError(f"Delta {delta['sequence']} expects base {delta['base_sequence']}, "
+                         f"snapshot is at {snapshot.get('sequence', 0)}")
+    channels = dict(snapshot.get("channels", {}))
+    for cid in delta["removed"]:
+        channels.pop(cid, None)
+    channels.update(delta["added"])
+    channels.update(delta["changed"])
+    return {
+        "sequence": delta["sequence"],
+        "generated_at": delta["generated_at"],
+        "channels": channels,
+    }
+
+
+def _write_json(path, data):
+    tmp = Path(str(path) + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"), ensure_ascii=False, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# ─── Publisher ────────────────────────────────────────────────────────────────
+
+class DeltaPublisher:
+    def __init__(self, delta_dir="output/delta", keep=DEFAULT_KEEP):
+        self.delta_dir = Path(delta_dir)
+        self.delta_dir.mkdir(parents=True, exist_ok=True)
+        self.keep = keep
+
+    def load_state(self):
+        path = self.delta_dir / STATE_NAME
+        if not path.exists():
+            return {"sequence": 0, "channels": {}}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def publish(self, entries):
+        """
+        Publish entries ({id: entry}) as the next sequence. Returns the delta,
+        or None when nothing changed.
+        """
+        state = self.load_state()
+        added, removed, changed = diff_snapshots(state["channels"], entries)
+        if not (added or removed or changed) and state["sequence"]:
+            logger.info(f"Delta: no changes since sequence {state['sequence']}")
+            return None
+
+        now = datetime.utcnow().isoformat() + "Z"
+        delta = {
+            "sequence": state["sequence"] + 1,
+            "base_sequence": state["sequence"],
+            "generated_at": now,
+            "added": added,
+            "removed": removed,
+            "changed": changed,
+        }
+        name = f"delta_{delta['sequence']:06d}.json"
+        _write_json(self.delta_dir / name, delta)
+        _write_json(self.delta_dir / STATE_NAME, {
+            "sequence": delta["sequence"],
+            "generated_at": now,
+            "channels": entries,
+        })
+        self._update_index(delta, name)
+
+        logger.info(f"Delta {delta['sequence']}: +{len(added)} -{len(removed)} ~{len(changed)}")
+        return delta
+
+    def _update_index(self, delta, name):
+        path = self.delta_dir / INDEX_NAME
+        index = {"deltas": []}
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                index = json.load(f)
+
+        index["deltas"].append({
+            "sequence": delta["sequence"],
+            "base_sequence": delta["base_sequence"],
+            "file": name,
+            "added": len(delta["added"]),
+            "removed": len(delta["removed"]),
+            "changed": len(delta["changed"]),
+        })
+        for old in index["deltas"][:-self.keep]:
+            try:
+                (self.delta_dir / old["file"]).unlink()
+            except FileNotFoundError:
+                pass
+        index["deltas"] = index["deltas"][-self.keep:]
+        index["latest_sequence"] = delta["sequence"]
+        index["oldest_sequence"] = index["deltas"][0]["base_sequence"]
+        index["state"] = STATE_NAME
+        _write_json(path, index)
+
+
+# ─── Client ───────────────────────────────────────────────────────────────────
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Apply delta playlist updates to a local snapshot")
+    sub = parser.add_subparsers(dest="command", required=True)
+    apply_cmd = sub.add_parser("apply", help="Apply delta files to a snapshot in place")
+    apply_cmd.add_argument("snapshot", help="Local snapshot (a copy of state.json)")
+    apply_cmd.add_argument("deltas", nargs="+", help="Delta files; already-applied ones are skipped")
+    args = parser.parse_args()
+
+    path = Path(args.snapshot)
+    snapshot = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {"sequence": 0, "channels": {}}
+
+    deltas = []
+    for name in args.deltas:
+        with open(name, encoding="utf-8") as f:
+            deltas.append(json.load(f))
+    for delta in sorted(deltas, key=lambda d: d["sequence"]):
+        if delta["sequence"] <= snapshot.get("sequence", 0):
+            continue
+        try:
+            snapshot = apply_delta(snapshot, delta)
+        except ValueError as e:
+            logger.error(f"{e} - download state.json for a full resync")
+            sys.exit(1)
+
+    _write_json(path, snapshot)
+    logger.info(f"Snapshot at sequence {snapshot['sequence']} ({len(snapshot['channels'])} channels)")
+
+
+if __name__ == "__main__":
+    main()
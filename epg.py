@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+EPG Index
+Streams XMLTV guides into a compact SQLite index (programmes clustered by
+channel and start time) for fast now/next lookups
+
+Usage:
+  python epg.py --db output/epg.db build guide.xml.gz [more sources...]
+  python epg.py --db output/epg.db now StarPlus.in ZeeTV.in
+
+build logs the process's peak RSS. To reproduce the memory figure on a
+synthetic guide:
+  python tests/xmltv_fixture.py /tmp/guide.xml.gz --programmes 1000000
+  python epg.py --db /tmp/epg.db build /tmp/guide.xml.gz
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from urllib.parse import urlparse
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "output/epg.db"
+BATCH_SIZE = 5000
+
+# WITHOUT ROWID stores rows in primary-key order, so each channel's programmes
+# sit contiguously sorted by start and lookups are a single B-tree search.
+PROGRAMMES_TABLE = """
+CREATE TABLE IF NOT EXISTS {name} (
+    channel TEXT NOT NULL,
+    start   INTEGER NOT NULL,
+    stop    INTEGER NOT NULL,
+    title   TEXT NOT NULL,
+    PRIMARY KEY (channel, start)
+) WITHOUT ROWID;
+"""
+
+SCHEMA = PROGRAMMES_TABLE.format(name="programmes") + """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Builds load here and replace the live table only once a source succeeded
+STAGING_TABLE = "programmes_staging"
+
+
+def parse_xmltv_time(value):
+    """Convert an XMLTV timestamp ("20240101120000 +0530") to epoch seconds"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    stamp, _, offset = value.partition(" ")
+    try:
+        dt = datetime.strptime(stamp[:14], "%Y%m%d%H%M%S")
+    except ValueError:
+        return None
+    tz = timezone.utc
+    if offset and len(offset) == 5 and offset[0] in "+-":
+        sign = 1 if offset[0] == "+" else -1
+        try:
+            tz = timezone(sign * timedelta(hours=int(offset[1:3]), minutes=int(offset[3:5])))
+        except ValueError:
+            # Malformed offset ("+0a30") or out of range; the programme is skipped
+            return None
+    return int(dt.replace(tzinfo=tz).timestamp())
+
+
+def _iso(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+# ─── Index ────────────────────────────────────────────────────────────────────
+
+class EPGIndex:
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def build(self, sources, channel_ids=None):
+        """
+        Rebuild the index from XMLTV sources (URLs or local paths, optionally
+        gzipped). Earlier sources win when two list the same slot. With
+        channel_ids, only those channels are kept. Sources load into a staging
+        table; if none of them loads, the previous index is kept as it was.
+        """
+        wanted = set(channel_ids) if channel_ids else None
+        with self.conn:
+            self.conn.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+            self.conn.executescript(PROGRAMMES_TABLE.format(name=STAGING_TABLE))
+        total = 0
+        loaded = 0
+        for source in sources:
+            try:
+                with _open_source(source) as f:
+                    count = self._load(f, wanted)
+            except Exception as e:
+                logger.warning(f"EPG: failed to load {source}: {e}")
+                continue
+            loaded += 1
+            total += count
+            logger.info(f"EPG: indexed {count} programmes from {source}")
+
+        if not loaded:
+            with self.conn:
+                self.conn.execute(f"DROP TABLE {STAGING_TABLE}")
+            logger.warning("EPG: no source could be loaded; keeping the previous index")
+            return 0
+
+        # Swap in one transaction so readers see the old or the new guide, never neither
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.execute("DROP TABLE programmes")
+            self.conn.execute(f"ALTER TABLE {STAGING_TABLE} RENAME TO programmes")
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('built_at', ?)",
+                              (datetime.utcnow().isoformat() + "Z",))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return total
+
+    def _load(self, f, wanted):
+        """Stream one XMLTV document; memory stays bounded by BATCH_SIZE rows"""
+        batch = []
+        count = 0
+        root = None
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if root is None:
+                root = elem
+                continue
+            if event != "end" or elem.tag != "programme":
+                continue
+
+            channel = elem.get("channel")
+            if channel and (wanted is None or channel in wanted):
+                start = parse_xmltv_time(elem.get("start"))
+                stop = parse_xmltv_time(elem.get("stop"))
+                if start is not None:
+                    title = elem.findtext("title") or ""
+                    batch.append((channel, start, stop if stop is not None else start, title))
+            # Drop parsed elements so the tree never grows
+            root.clear()
+
+            if len(batch) >= BATCH_SIZE:
+                count += self._flush(batch)
+                batch = []
+        count += self._flush(batch)
+        return count
+
+    def _flush(self, batch):
+        if not batch:
+            return 0
+        with self.conn:
+            cur = self.conn.executemany(
+                f"INSERT OR IGNORE INTO {STAGING_TABLE} (channel, start, stop, title) VALUES (?, ?, ?, ?)",
+                batch,
+            )
+        return cur.rowcount
+
+    def now_next(self, channel_ids, at=None):
+        """Return {channel_id: {"now": programme|None, "next": programme|None}}"""
+        at = int(at if at is not None else time.time())
+        result = {}
+        for cid in channel_ids:
+            now = self.conn.execute(
+                "SELECT start, stop, title FROM programmes "
+                "WHERE channel = ? AND start <= ? ORDER BY start DESC LIMIT 1",
+                (cid, at),
+            ).fetchone()
+            if now and now[1] <= at:
+                now = None
+            nxt = self.conn.execute(
+                "SELECT start, stop, title FROM programmes "
+                "WHERE channel = ? AND start > ? ORDER BY start LIMIT 1",
+                (cid, at),
+            ).fetchone()
+            result[cid] = {"now": _programme(now), "next": _programme(nxt)}
+        return result
+
+    def write_now_next(self, channel_ids, path="output/now_next.json", at=None):
+        at = int(at if at is not None else time.time())
+        ids = sorted(set(channel_ids))
+        data = {
+            "generated_at": _iso(at),
+            "channels": {cid: entry for cid, entry in self.now_next(ids, at=at).items()
+                         if entry["now"] or entry["next"]},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        logger.info(f"Now/next saved: {path} ({len(data['channels'])}/{len(ids)} channels with guide data)")
+        return str(path)
+
+
+def _programme(row):
+    if not row:
+        return None
+    return {"start": _iso(row[0]), "stop": _iso(row[1]), "title": row[2]}
+
+
+@contextmanager
+def _open_source(source):
+    """Open an XMLTV source as a binary stream; URLs are spooled to a temp file"""
+    parsed = urlparse(source)
+    if parsed.scheme in ("http", "https"):
+        import requests
+        f = tempfile.TemporaryFile()
+        with requests.get(source, stream=True, timeout=60) as resp:
+            resp.raise_for_status()
+            for chunk in resp.iter_content(chunk_size=1 << 16):
+                f.write(chunk)
+        f.seek(0)
+    else:
+        f = open(parsed.path if parsed.scheme == "file" else source, "rb")
+
+    try:
+        if f.read(2) == b"\x1f\x8b":
+            f.seek(0)
+            with gzip.GzipFile(fileobj=f) as gz:
+                yield gz
+        else:
+            f.seek(0)
+            yield f
+    finally:
+        f.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="EPG now/next index")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help=f"Index path (default: {DEFAULT_DB_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build the index from XMLTV sources")
+    build.add_argument("sources", nargs="+", help="XMLTV URLs or local paths (.xml or .xml.gz)")
+    now = sub.add_parser("now", help="Show now/next for channel ids")
+    now.add_argument("channels", nargs="+", help="tvg-ids")
+    args = parser.parse_args()
+
+    with EPGIndex(args.db) as index:
+        if args.command == "build":
+            import resource
+            started = time.perf_counter()
+            total = index.build(args.sources)
+            peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            logger.info(f"Indexed {total} programmes in {time.perf_counter() - started:.1f}s "
+                        f"(peak RSS {peak_mb:.0f} MB)")
+        else:
+            print(json.dumps(index.now_next(args.channels), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,19 @@ Playlist Generator - Creates M3U and EPG XML files from scraped channels
 import os
 import json
 import gzip
+import time
 import logging
-import requests
+import tempfile
 from datetime import datetime
 from pathlib import Path
 from xml.etree.ElementTree import Element, SubElement, tostring, indent
 import xml.etree.ElementTree as ET
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 logger = logging.getLogger(__name__)
 
 # ─── EPG Sources ──────────────────────────────────────────────────────────────
@@ -120,9 +126,10 @@ KNOWN_TVG_IDS = {
 
 
 class PlaylistGenerator:
-    def __init__(self, output_dir="output"):
+    def __init__(self, output_dir="output", history=None):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.history = history  # optional history.ChannelHistory for ranking
 
     def get_tvg_id(self, channel_name):
         name_lower = channel_name.lower().strip()
@@ -131,46 +138,89 @@ class PlaylistGenerator:
                 return tvg_id
         return channel_name.replace(" ", "")
 
-    def generate_m3u(self, channels, filename="india_iptv.m3u"):
-        """Generate M3U8 playlist"""
-        # EPG URL string
-        epg_urls = " ".join([f'url-tvg="{u}"' for u in EPG_SOURCES[:2]])
+    def rank_channels(self, channels):
+        """
+        Order channels by category, then by reliability from the history store.
+        Mirrors (same name) are grouped together, best mirror first; channel
+        groups are ranked by their best mirror. Falls back to alphabetical
+        order when no history is available.
+        """
+        if self.history is None:
+            return sorted(channels, key=lambda x: (x.get("category", "General"), x.get("name", "")))
+
+        from history import stream_key
+        stats = self.history.stream_stats([stream_key(ch) for ch in channels])
+
+        def score(ch):
+            st = stats.get(stream_key(ch))
+            if not st:
+                # Unknown streams rank after known-good ones but before known-bad ones
+                return (-0.5, float("inf"))
+            latency = st["median_latency_ms"]
+            return (-st["uptime"], latency if latency is not None else float("inf"))
+
+        best = {}
+        for ch in channels:
+            group = (ch.get("category", "General"), ch.get("name", ""))
+            s = score(ch)
+            if group not in best or s < best[group]:
+                best[group] = s
 
-        lines = [
+        def key(ch):
+            cat = ch.get("category", "General")
+            name = ch.get("name", "")
+            return (cat, best[(cat, name)], name, score(ch))
+
+        return sorted(channels, key=key)
+
+    def _m3u_header(self):
+        return (
             f'#EXTM3U x-tvg-url="{EPG_SOURCES[0]}" '
             f'url-tvg="{EPG_SOURCES[1]}" '
-            f'refresh="3600"\n',
-        ]
+            f'refresh="3600"\n'
+        )
+
+    def _m3u_entry(self, ch):
+        """EXTINF + URL lines for one channel, or None if it has no stream"""
+        cat = ch.get("category", "General")
+        name = ch.get("name", "Unknown")
+        stream_url = ch.get("stream_url", "")
+        logo = ch.get("logo", "")
+        tvg_id = self.get_tvg_id(name)
+
+        if not stream_url:
+            return None
+
+        # EXTINF line
+        extinf = (
+            f'#EXTINF:-1 tvg-id="{tvg_id}" '
+            f'tvg-name="{name}" '
+            f'tvg-logo="{logo}" '
+            f'group-title="{cat}"'
+            f',{name}\n'
+        )
+        return extinf + f"{stream_url}\n"
+
+    def generate_m3u(self, channels, filename="india_iptv.m3u"):
+        """Generate M3U8 playlist"""
+        lines = [self._m3u_header()]
 
-        # Sort by category then name
-        sorted_channels = sorted(channels, key=lambda x: (x.get("category", "General"), x.get("name", "")))
+        # Sort by category, then by reliability (or name without history)
+        sorted_channels = self.rank_channels(channels)
 
         current_cat = None
         for ch in sorted_channels:
-            cat = ch.get("category", "General")
-            name = ch.get("name", "Unknown")
-            stream_url = ch.get("stream_url", "")
-            logo = ch.get("logo", "")
-            tvg_id = self.get_tvg_id(name)
-
-            if not stream_url:
+            entry = self._m3u_entry(ch)
+            if not entry:
                 continue
 
             # Add category separator comment
+            cat = ch.get("category", "General")
             if cat != current_cat:
                 lines.append(f"\n# ═══ {cat} ═══\n")
                 current_cat = cat
 
-            # EXTINF line
-            extinf = (
-                f'#EXTINF:-1 tvg-id="{tvg_id}" '
-                f'tvg-name="{name}" '
-                f'tvg-logo="{logo}" '
-                f'group-title="{cat}"'
-                f',{name}\n'
-            )
-            lines.append(extinf)
-            lines.append(f"{stream_url}\n")
+            lines.append(entry)
 
         output_path = self.output_dir / filename
         with open(output_path, "w", encoding="utf-8") as f:
@@ -188,16 +238,59 @@ class PlaylistGenerator:
 
         files = []
         for cat, chans in cat_channels.items():
-            safe_cat = re.sub(r'[^\w\- ]', '', cat).strip().replace(" ", "_")
-            fname = f"india_{safe_cat.lower()}.m3u"
+            fname = category_filename(cat)
             path = self.generate_m3u(chans, filename=fname)
             files.append((cat, path, len(chans)))
             logger.info(f"  {cat}: {len(chans)} channels → {fname}")
 
         return files
 
-    def generate_json_index(self, channels, filename="channels.json"):
-        """Generate JSON index of all channels"""
+    def generate_streaming(self, channels, filename="india_iptv.m3u", split=True,
+                           index_filename="channels.json"):
+        """
+        Consume a channel iterable and write the main playlist, per-category
+        playlists and the JSON index incrementally. Entries appear in arrival
+        order (no ranking). Returns {"total", "categories": Counter, "files"}.
+        """
+        with StreamingPlaylistWriter(self, filename=filename, split=split,
+                                     index_filename=index_filename) as writer:
+            for ch in channels:
+                writer.write(ch)
+        return writer.summary
+
+    def generate_quality_playlists(self, channels, qualities=("sd", "hd")):
+        """
+        Generate india_iptv_<quality>.m3u playlists that point straight at the
+        matching HLS variant of each channel (see hls.HLSAnalyzer)
+        """
+        from hls import pick_variant
+        from geobypass import is_geo_blocked, wrap_with_proxy
+
+        files = []
+        for quality in qualities:
+            picked = []
+            for ch in channels:
+                variant = pick_variant(ch.get("variants") or [], quality)
+                if not variant:
+                    continue
+                url = variant["url"]
+                if is_geo_blocked(url):
+                    url = wrap_with_proxy(url)
+                # Keep the master URL so the history key matches the main playlist
+                picked.append(dict(ch, stream_url=url, origin_url=ch.get("origin_url") or ch["stream_url"]))
+
+            fname = f"india_iptv_{quality}.m3u"
+            path = self.generate_m3u(picked, filename=fname)
+            files.append((quality, path, len(picked)))
+            logger.info(f"  {quality.upper()}: {len(picked)} channels → {fname}")
+
+        return files
+
+    def build_index(self, channels):
+        """
+        The channel index behind channels.json and its compact variants; build
+        it once and pass it to each writer so they share one generated_at
+        """
         from collections import defaultdict
         index = {
             "generated_at": datetime.utcnow().isoformat() + "Z",
@@ -206,12 +299,14 @@ class PlaylistGenerator:
             "categories": {},
         }
 
+        from delta import assign_identities
         cat_map = defaultdict(list)
-        for ch in channels:
+        for ch in assign_identities(channels):
             cat_map[ch.get("category", "General")].append({
+                "id": ch["identity"],
                 "name": ch["name"],
                 "url": ch["stream_url"],
-                "logo": ch.get("logo", ""),
+                "logo": ch.get("logo") or "",
                 "tvg_id": self.get_tvg_id(ch["name"]),
                 "is_online": ch.get("is_online", True),
             })
@@ -221,6 +316,11 @@ class PlaylistGenerator:
                 "count": len(chans),
                 "channels": chans,
             }
+        return index
+
+    def generate_json_index(self, channels, filename="channels.json", index=None):
+        """Generate JSON index of all channels (from index, if already built)"""
+        index = index or self.build_index(channels)
 
         output_path = self.output_dir / filename
         with open(output_path, "w", encoding="utf-8") as f:
@@ -229,6 +329,77 @@ class PlaylistGenerator:
         logger.info(f"JSON index saved: {output_path}")
         return str(output_path)
 
+    def generate_compact_artifacts(self, channels, playlists=(), index=None):
+        """
+        Write compact variants of the channel index (minified, columnar and
+        NDJSON) plus .gz/.br copies of every playlist. Pass the index written
+        to channels.json so every variant carries the same generated_at.
+        Returns a report row per artifact with its size and serialization time.
+        """
+        index = index or self.build_index(channels)
+        report = []
+
+        def timed(fmt, path, render, write=True):
+            started = time.perf_counter()
+            data = render()
+            elapsed = (time.perf_counter() - started) * 1000
+            if write:
+                with open(path, "wb") as f:
+                    f.write(data)
+            report.append({"format": fmt, "path": str(path), "bytes": len(data), "ms": round(elapsed, 2)})
+
+        # Baseline: the readable index written by generate_json_index
+        timed("json (indent=2)", self.output_dir / "channels.json",
+              lambda: json.dumps(index, indent=2, ensure_ascii=False).encode("utf-8"), write=False)
+        timed("json (minified)", self.output_dir / "channels.min.json",
+              lambda: json.dumps(index, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+        timed("json (columnar)", self.output_dir / "channels.columnar.json",
+              lambda: json.dumps(encode_columnar(index), separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+        timed("ndjson", self.output_dir / "channels.ndjson", lambda: self._render_ndjson(index))
+
+        for playlist in playlists:
+            playlist = Path(playlist)
+            raw = playlist.read_bytes()
+            report.append({"format": "m3u", "path": str(playlist), "bytes": len(raw), "ms": 0.0})
+            timed("m3u.gz", playlist.with_name(playlist.name + ".gz"),
+                  lambda: gzip.compress(raw, compresslevel=9, mtime=0))
+            if brotli is not None:
+                timed("m3u.br", playlist.with_name(playlist.name + ".br"),
+                      lambda: brotli.compress(raw, quality=11))
+
+        if playlists and brotli is None:
+            logger.warning("brotli not installed - skipping .br playlist copies (pip install brotli)")
+
+        logger.info("Compact artifacts:")
+        logger.info(f"  {'Format':<18} {'Bytes':>10} {'ms':>9}  Path")
+        for row in report:
+            logger.info(f"  {row['format']:<18} {row['bytes']:>10} {row['ms']:>9.2f}  {row['path']}")
+        return report
+
+    def _render_ndjson(self, index):
+        """One channel per line, with its category inlined"""
+        lines = []
+        for cat, entry in index["categories"].items():
+            for ch in entry["channels"]:
+                lines.append(json.dumps(dict(ch, category=cat), separators=(",", ":"), ensure_ascii=False))
+        return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+    def generate_delta(self, channels, dirname="delta", keep=20):
+        """Publish a delta against the previous run's channel set (see delta.py)"""
+        from delta import DeltaPublisher, assign_identities
+        entries = {}
+        for ch in assign_identities(channels):
+            if not ch.get("stream_url"):
+                continue
+            entries[ch["identity"]] = {
+                "name": ch["name"],
+                "url": ch["stream_url"],
+                "category": ch.get("category", "General"),
+                "logo": ch.get("logo", ""),
+                "tvg_id": self.get_tvg_id(ch["name"]),
+            }
+        return DeltaPublisher(self.output_dir / dirname, keep=keep).publish(entries)
+
     def generate_readme(self, channels, filename="README.md"):
         """Generate README with channel list and usage instructions"""
         from collections import defaultdict
@@ -299,4 +470,217 @@ class PlaylistGenerator:
         return str(output_path)
 
 
+def category_filename(cat):
+    safe_cat = re.sub(r'[^\w\- ]', '', cat).strip().replace(" ", "_")
+    return f"india_{safe_cat.lower()}.m3u"
+
+
+def load_json_index(path):
+    """Read a channels.json index back into channel dicts (the inverse of build_index)"""
+    with open(path, encoding="utf-8") as f:
+        index = json.load(f)
+    channels = []
+    for cat, entry in index.get("categories", {}).items():
+        for ch in entry.get("channels", []):
+            channels.append({
+                "identity": ch.get("id"),
+                "name": ch["name"],
+                "stream_url": ch["url"],
+                "logo": ch.get("logo", ""),
+                "category": cat,
+                "tvg_id": ch.get("tvg_id", ""),
+                "is_online": ch.get("is_online", True),
+            })
+    return channels
+
+
+# ─── Streaming Writer ─────────────────────────────────────────────────────────
+
+class StreamingPlaylistWriter:
+    """
+    Writes playlists one channel at a time. Only open file handles and
+    per-category counters are kept in memory; JSON index records are spooled
+    to per-category temp files and stitched together on close. Everything is
+    written to .tmp files that replace the published ones only when close()
+    commits a non-empty run, so a failed crawl leaves the last output intact.
+    """
+
+    def __init__(self, gen, filename="india_iptv.m3u", split=True, index_filename="channels.json"):
+        from collections import Counter
+        self.gen = gen
+        self.split = split
+        self.index_path = gen.output_dir / index_filename
+        self.main_path = gen.output_dir / filename
+        self.main = open(_tmp_path(self.main_path), "w", encoding="utf-8")
+        self.main.write(gen._m3u_header())
+        self.cat_files = {}
+        self.spools = {}
+        self.counts = Counter()
+        self.identities = {}  # shared with assign_identities across write() calls
+        self.started = time.perf_counter()
+        self.summary = None
+
+    def write(self, ch):
+        from delta import assign_identities
+        entry = self.gen._m3u_entry(ch)
+        if not entry:
+            return
+        cat = ch.get("category", "General")
+        if not self.counts:
+            logger.info(f"First channel written after {time.perf_counter() - self.started:.2f}s")
+        self.counts[cat] += 1
+
+        self.main.write(entry)
+        self.main.flush()
+
+        if self.split:
+            if cat not in self.cat_files:
+                f = open(_tmp_path(self.gen.output_dir / category_filename(cat)), "w", encoding="utf-8")
+                f.write(self.gen._m3u_header())
+                self.cat_files[cat] = f
+            self.cat_files[cat].write(entry)
+            self.cat_files[cat].flush()
+
+        if cat not in self.spools:
+            self.spools[cat] = tempfile.TemporaryFile("w+", encoding="utf-8")
+        assign_identities([ch], self.identities)
+        self.spools[cat].write(json.dumps({
+            "id": ch["identity"],
+            "name": ch["name"],
+            "url": ch["stream_url"],
+            "logo": ch.get("logo", ""),
+            "tvg_id": self.gen.get_tvg_id(ch["name"]),
+            "is_online": ch.get("is_online", True),
+        }, ensure_ascii=False) + "\n")
+
+    def close(self, commit=True):
+        """Publish the files (commit=True and at least one channel) or discard them"""
+        total = sum(self.counts.values())
+        paths = [self.main_path] + [self.gen.output_dir / category_filename(cat) for cat in self.cat_files]
+        self.main.close()
+        for f in self.cat_files.values():
+            f.close()
+        self.summary = {"total": total, "categories": self.counts, "files": []}
+
+        if not (commit and total):
+            for path in paths:
+                _tmp_path(path).unlink(missing_ok=True)
+            for spool in self.spools.values():
+                spool.close()
+            logger.warning(f"Streaming run {'produced no channels' if commit else 'failed'}; "
+                           f"previous output left untouched")
+            return
+
+        self._write_index()
+        for path in paths + [self.index_path]:
+            os.replace(_tmp_path(path), path)
+        self.summary["files"] = [("All", str(self.main_path), total)] + [
+            (cat, str(self.gen.output_dir / category_filename(cat)), self.counts[cat]) for cat in self.cat_files
+        ]
+        logger.info(f"Streamed {total} channels in {time.perf_counter() - self.started:.2f}s")
+
+    def _write_index(self):
+        """Same layout as PlaylistGenerator.generate_json_index, built from the spools"""
+        with open(_tmp_path(self.index_path), "w", encoding="utf-8") as out:
+            head = {
+                "generated_at": datetime.utcnow().isoformat() + "Z",
+                "total_channels": sum(self.counts.values()),
+                "epg_sources": EPG_SOURCES,
+            }
+            out.write(json.dumps(head, indent=2, ensure_ascii=False)[:-2] + ',\n  "categories": {')
+            for n, cat in enumerate(sorted(self.spools)):
+                spool = self.spools[cat]
+                spool.seek(0)
+                out.write(("," if n else "") + f'\n    {json.dumps(cat, ensure_ascii=False)}: {{\n'
+                          f'      "count": {self.counts[cat]},\n      "channels": [')
+                for i, line in enumerate(spool):
+                    record = json.dumps(json.loads(line), indent=2, ensure_ascii=False)
+                    out.write(("," if i else "") + "\n        " + record.replace("\n", "\n        "))
+                out.write("\n      ]\n    }")
+                spool.close()
+            out.write("\n  }\n}" if self.spools else "}\n}")
+        logger.info(f"JSON index saved: {self.index_path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+
+def _tmp_path(path):
+    return path.with_name(path.name + ".tmp")
+
+
+# ─── Columnar Index ───────────────────────────────────────────────────────────
+
+COLUMNAR_FIELDS = ["category", "id", "name", "url", "logo", "tvg_id"]
+COLUMNAR_URL_FIELDS = {"url", "logo"}
+
+
+def encode_columnar(index):
+    """
+    Convert a channel index into a columnar form with a shared string table.
+    URL fields are split into base + file so long shared prefixes (e.g. the
+    logo repository path) are stored once.
+    """
+    strings = []
+    lookup = {}
+
+    def intern(value):
+        value = value or ""
+        if value not in lookup:
+            lookup[value] = len(strings)
+            strings.append(value)
+        return lookup[value]
+
+    columns = {}
+    for field in COLUMNAR_FIELDS:
+        if field in COLUMNAR_URL_FIELDS:
+            columns[field + "_base"] = []
+            columns[field + "_file"] = []
+        else:
+            columns[field] = []
+    columns["is_online"] = []
+
+    for cat, entry in index["categories"].items():
+        for ch in entry["channels"]:
+            row = dict(ch, category=cat)
+            for field in COLUMNAR_FIELDS:
+                value = row.get(field) or ""
+                if field in COLUMNAR_URL_FIELDS:
+                    base, _, name = value.rpartition("/")
+                    columns[field + "_base"].append(intern(base + "/" if base else ""))
+                    columns[field + "_file"].append(intern(name))
+                else:
+                    columns[field].append(intern(value))
+            columns["is_online"].append(1 if row.get("is_online", True) else 0)
+
+    return {
+        "format": "columnar-v1",
+        "generated_at": index["generated_at"],
+        "total_channels": index["total_channels"],
+        "epg_sources": index["epg_sources"],
+        "strings": strings,
+        "columns": columns,
+    }
+
+
+def decode_columnar(data):
+    """Expand a columnar index back into a list of channel dicts"""
+    strings = data["strings"]
+    columns = data["columns"]
+    channels = []
+    for i in range(len(columns["is_online"])):
+        ch = {}
+        for field in COLUMNAR_FIELDS:
+            if field in COLUMNAR_URL_FIELDS:
+                ch[field] = strings[columns[field + "_base"][i]] + strings[columns[field + "_file"][i]]
+            else:
+                ch[field] = strings[columns[field][i]]
+        ch["is_online"] = bool(columns["is_online"][i])
+        channels.append(ch)
+    return channels
+
+
 import re
@@ -74,6 +74,25 @@ def wrap_with_proxy(url):
     return url  # Return original if no proxy configured
 
 
+def proxy_prefixes():
+    """URL prefixes that wrap_with_proxy can produce with the current configuration"""
+    prefixes = []
+    if CLOUDFLARE_WORKER_URL:
+        prefixes.append(f"{CLOUDFLARE_WORKER_URL.rstrip('/')}/?url=")
+    if PROXY_URL and "socks" not in PROXY_URL and "http" in PROXY_URL:
+        prefixes.append(f"{PROXY_URL.rstrip('/')}/proxy?url=")
+    prefixes += [template.split("{url}", 1)[0] for template in FREE_STREAM_PROXIES]
+    return [p for p in prefixes if p]
+
+
+def unwrap_proxy(url):
+    """Original stream URL of an already proxied URL (unchanged if not proxied)"""
+    for prefix in proxy_prefixes():
+        if url.startswith(prefix):
+            return url[len(prefix):]
+    return url
+
+
 def generate_streamlink_script(channels, output_path="scripts/play_channel.sh"):
     """
     Generate a Streamlink script for geo-blocked channels.
@@ -123,23 +142,40 @@ fi
 def apply_proxy_to_channels(channels):
     """
     Modify geo-blocked channel URLs to route through proxy.
-    Only modifies if proxy is configured.
+    Only modifies if proxy is configured. A list is updated in place and
+    returned; any other iterable is wrapped in a lazy generator.
     """
     if not (CLOUDFLARE_WORKER_URL or PROXY_URL or FREE_STREAM_PROXIES):
         logger.info("No proxy configured. Geo-blocked channels will play directly.")
         logger.info("Set CLOUDFLARE_WORKER_URL or PROXY_URL env vars to enable bypass.")
         return channels
 
+    if isinstance(channels, list):
+        modified = sum(1 for ch in channels if _proxy_channel(ch))
+        logger.info(f"Applied proxy to {modified} potentially geo-blocked channels")
+        return channels
+    return _proxy_stream(channels)
+
+
+def _proxy_channel(ch):
+    # Channels reloaded from a previous run's index may already be wrapped
+    url = unwrap_proxy(ch.get("stream_url", ""))
+    if url and is_geo_blocked(url):
+        ch["origin_url"] = url
+        ch["stream_url"] = wrap_with_proxy(url)
+        return True
+    if url:
+        ch["stream_url"] = url  # no longer matches a geo-block pattern
+    return False
+
+
+def _proxy_stream(channels):
     modified = 0
     for ch in channels:
-        url = ch.get("stream_url", "")
-        if url and is_geo_blocked(url):
-            ch["stream_url"] = wrap_with_proxy(url)
-            ch["name"] = ch["name"]  # keep name
+        if _proxy_channel(ch):
             modified += 1
-
+        yield ch
     logger.info(f"Applied proxy to {modified} potentially geo-blocked channels")
-    return channels
 
 
 def generate_cloudflare_worker():
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Channel History Store
+Persists per-run stream observations in SQLite so channels and mirrors
+can be ranked by rolling uptime and median latency
+"""
+
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# ─── Configuration ────────────────────────────────────────────────────────────
+
+DEFAULT_DB_PATH = "output/history.db"
+DEFAULT_WINDOW_DAYS = 7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at  TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS observations (
+    run_id      INTEGER NOT NULL REFERENCES runs(id),
+    stream_url  TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    is_online   INTEGER NOT NULL,
+    resolved    INTEGER NOT NULL,
+    latency_ms  REAL,
+    observed_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_obs_stream_time ON observations (stream_url, observed_at);
+CREATE INDEX IF NOT EXISTS idx_obs_time ON observations (observed_at);
+"""
+
+
+# ─── History Store ────────────────────────────────────────────────────────────
+
+class ChannelHistory:
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._stats_cache = {}
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record_run(self, channels):
+        """Record one observation per stream for this run in a single transaction"""
+        from delta import assign_identities
+        now = datetime.utcnow().isoformat() + "Z"
+        rows = []
+        for ch in assign_identities(channels):
+            if not (ch.get("stream_url") or ch.get("detail_link") or ch.get("identity")):
+                continue
+            rows.append((
+                stream_key(ch),
+                ch.get("name", ""),
+                1 if ch.get("is_online", True) else 0,
+                1 if ch.get("stream_url") else 0,
+                ch.get("latency_ms"),
+                now,
+            ))
+
+        with self.conn:
+            cur = self.conn.execute("INSERT INTO runs (started_at) VALUES (?)", (now,))
+            run_id = cur.lastrowid
+            self.conn.executemany(
+                "INSERT INTO observations "
+                "(run_id, stream_url, name, is_online, resolved, latency_ms, observed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(run_id,) + row for row in rows],
+            )
+
+        self._stats_cache.clear()
+        logger.info(f"History: recorded {len(rows)} observations for run {run_id}")
+        return run_id
+
+    def stream_stats(self, stream_urls, window_days=DEFAULT_WINDOW_DAYS):
+        """
+        Return {key: {"uptime", "samples", "median_latency_ms"}} over the
+        rolling window for the given stream_key()s. Streams with no history
+        are omitted.
+        """
+        since = (datetime.utcnow() - timedelta(days=window_days)).isoformat() + "Z"
+        wanted = [u for u in set(stream_urls) if u and (u, window_days) not in self._stats_cache]
+
+        # Chunk to stay below SQLite's bound-parameter limit
+        for i in range(0, len(wanted), 500):
+            chunk = wanted[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            params = chunk + [since]
+
+            uptime = {
+                row[0]: (row[1], row[2])
+                for row in self.conn.execute(
+                    f"SELECT stream_url, AVG(is_online * resolved), COUNT(*) "
+                    f"FROM observations WHERE stream_url IN ({marks}) AND observed_at >= ? "
+                    f"GROUP BY stream_url",
+                    params,
+                )
+            }
+
+            latencies = {}
+            for url, latency in self.conn.execute(
+                f"SELECT stream_url, latency_ms FROM observations "
+                f"WHERE stream_url IN ({marks}) AND observed_at >= ? AND latency_ms IS NOT NULL "
+                f"ORDER BY stream_url, latency_ms",
+                params,
+            ):
+                latencies.setdefault(url, []).append(latency)
+
+            for url in chunk:
+                if url not in uptime:
+                    self._stats_cache[(url, window_days)] = None
+                    continue
+                ratio, samples = uptime[url]
+                self._stats_cache[(url, window_days)] = {
+                    "uptime": ratio,
+                    "samples": samples,
+                    "median_latency_ms": _median_sorted(latencies.get(url, [])),
+                }
+
+        stats = {}
+        for url in set(stream_urls):
+            entry = self._stats_cache.get((url, window_days))
+            if entry:
+                stats[url] = entry
+        return stats
+
+    def prune(self, keep_days=90):
+        """Drop observations older than keep_days"""
+        cutoff = (datetime.utcnow() - timedelta(days=keep_days)).isoformat() + "Z"
+        with self.conn:
+            cur = self.conn.execute("DELETE FROM observations WHERE observed_at < ?", (cutoff,))
+            self.conn.execute("DELETE FROM runs WHERE started_at < ?", (cutoff,))
+        self._stats_cache.clear()
+        if cur.rowcount:
+            logger.info(f"History: pruned {cur.rowcount} observations older than {keep_days} days")
+        return cur.rowcount
+
+
+def stream_key(channel):
+    """
+    History key for a channel: its stable identity (see delta.channel_identity),
+    so a stream URL whose query token rotates every run keeps one history.
+    Stored in the observations.stream_url column.
+    """
+    from delta import channel_identity
+    return channel_identity(channel)
+
+
+def _median_sorted(values):
+    if not values:
+        return None
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2
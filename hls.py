@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+HLS Master Playlist Analysis
+Fetches each channel's master playlist once, extracts its variants
+(bandwidth, resolution, codecs) and picks per-quality variant URLs
+"""
+
+import re
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+logger = logging.getLogger(__name__)
+
+# ─── Configuration ────────────────────────────────────────────────────────────
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+}
+
+# Variants at or above this height go to the HD playlist, below it to SD
+HD_MIN_HEIGHT = 720
+HD_MAX_HEIGHT = 1080
+# Used when a variant has no RESOLUTION attribute
+SD_MAX_BANDWIDTH = 1_500_000
+
+ATTR_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+# ─── Parsing ──────────────────────────────────────────────────────────────────
+
+def parse_attributes(line):
+    """Parse an HLS attribute list (the part after the tag's colon)"""
+    attrs = {}
+    for key, value in ATTR_RE.findall(line):
+        attrs[key] = value.strip('"')
+    return attrs
+
+
+def parse_master_playlist(text, base_url=""):
+    """
+    Return the variants of a master playlist as a list of dicts, lowest
+    bandwidth first. Media playlists (no EXT-X-STREAM-INF) return [].
+    """
+    variants = []
+    pending = None
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith("#EXT-X-STREAM-INF:"):
+            pending = parse_attributes(line.split(":", 1)[1])
+            continue
+        if line.startswith("#"):
+            continue
+        if pending is not None:
+            width = height = None
+            resolution = pending.get("RESOLUTION", "")
+            if "x" in resolution:
+                try:
+                    width, height = (int(v) for v in resolution.lower().split("x", 1))
+                except ValueError:
+                    width = height = None
+            try:
+                bandwidth = int(pending.get("BANDWIDTH", 0))
+            except ValueError:
+                bandwidth = 0
+            variants.append({
+                "url": urljoin(base_url, line),
+                "bandwidth": bandwidth,
+                "resolution": resolution or None,
+                "width": width,
+                "height": height,
+                "codecs": pending.get("CODECS"),
+            })
+            pending = None
+
+    variants.sort(key=lambda v: v["bandwidth"])
+    return variants
+
+
+def parse_media_playlist(text):
+    """
+    Summarize a media playlist as a dict with media_sequence, segments,
+    target_duration, last_segment (URI of the newest segment) and ended
+    (EXT-X-ENDLIST seen). Segment URIs other than the last are not kept.
+    """
+    info = {"media_sequence": 0, "segments": 0, "target_duration": None,
+            "last_segment": None, "ended": False}
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            try:
+                info["media_sequence"] = int(line.split(":", 1)[1])
+            except ValueError:
+                pass
+        elif line.startswith("#EXT-X-TARGETDURATION:"):
+            try:
+                info["target_duration"] = float(line.split(":", 1)[1])
+            except ValueError:
+                pass
+        elif line.startswith("#EXT-X-ENDLIST"):
+            info["ended"] = True
+        elif not line.startswith("#"):
+            info["segments"] += 1
+            info["last_segment"] = line
+    return info
+
+
+def is_hd(variant):
+    if variant["height"]:
+        return variant["height"] >= HD_MIN_HEIGHT
+    return variant["bandwidth"] > SD_MAX_BANDWIDTH
+
+
+def pick_variant(variants, quality):
+    """Pick the best variant for "sd" or "hd", or None if none match"""
+    if quality == "sd":
+        matches = [v for v in variants if not is_hd(v)]
+    elif quality == "hd":
+        matches = [v for v in variants if is_hd(v) and (v["height"] or 0) <= HD_MAX_HEIGHT]
+    else:
+        raise ValueError(f"Unknown quality: {quality}")
+    if not matches:
+        return None
+    # Highest bandwidth within the quality band
+    return max(matches, key=lambda v: v["bandwidth"])
+
+
+# ─── Analyzer ─────────────────────────────────────────────────────────────────
+
+class HLSAnalyzer:
+    def __init__(self, session=None, max_workers=16, timeout=15, negative_cache=None, fetch=None):
+        self.session = session
+        # Optional fetch(url) -> text replacing HTTP, e.g. to load fixture playlists
+        self.fetch = fetch
+        self.negative_cache = negative_cache
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+    def fetch_playlist(self, url):
+        """Fetch playlist text over HTTP (or through the fetch callable, if one was given)"""
+        if self.fetch is not None:
+            return self.fetch(url)
+        if self.session is None:
+            import requests
+            self.session = requests.Session()
+            self.session.headers.update(HEADERS)
+        resp = self.session.get(url, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.text
+
+    def analyze_url(self, url):
+        # Scraped URLs come from untrusted HTML; never follow anything but HTTP(S)
+        if self.fetch is None and urlparse(url).scheme not in ("http", "https"):
+            logger.debug(f"HLS: skipping non-HTTP URL {url}")
+            return []
+        cache = self.negative_cache
+        if cache is not None and cache.is_dead(url):
+            return []
+        try:
+            text = self.fetch_playlist(url)
+        except Exception as e:
+            logger.debug(f"HLS fetch failed for {url}: {e}")
+            if cache is not None:
+                cache.record_failure(url, host_level=getattr(e, "response", None) is None)
+            return []
+        if cache is not None:
+            cache.record_success(url)
+        if "#EXTM3U" not in text[:1024]:
+            return []
+        return parse_master_playlist(text, base_url=url)
+
+    def analyze_channels(self, channels):
+        """Attach a "variants" list to every channel; each master URL is fetched once"""
+        urls = sorted({ch["stream_url"] for ch in channels if ch.get("stream_url")})
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = dict(zip(urls, pool.map(self.analyze_url, urls)))
+
+        with_variants = 0
+        for ch in channels:
+            variants = results.get(ch.get("stream_url"), [])
+            ch["variants"] = variants
+            if variants:
+                with_variants += 1
+
+        logger.info(f"HLS: analyzed {len(urls)} playlists, {with_variants} channels have variants")
+        return channels
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Logo Verification & Cache
+Checks candidate logo URLs, stores valid images locally (resized and
+deduplicated by content hash) and rewrites tvg-logo to the cached copy
+"""
+
+import os
+import re
+import json
+import zlib
+import struct
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from io import BytesIO
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# ─── Configuration ────────────────────────────────────────────────────────────
+#
+# LOGO_BASE_URL is the public URL of output/logos/, e.g.
+#   https://raw.githubusercontent.com/USER/REPO/main/output/logos/
+# In GitHub Actions it defaults to that URL for the running repository and
+# branch. Players do not resolve relative tvg-logo URLs, so without a base
+# URL the logo cache is not used.
+
+LOGO_BASE_URL = os.getenv("LOGO_BASE_URL", "")
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+}
+
+PLACEHOLDER_NAME = "placeholder.png"
+INDEX_NAME = "index.json"
+# Stored logos are named by content hash (see LogoStore.fetch); only these are pruned
+STORED_NAME_RE = re.compile(r"^[0-9a-f]{20}\.[a-z]+$")
+
+MAX_LOGO_BYTES = 1024 * 1024  # larger downloads are abandoned
+
+CONTENT_TYPE_EXT = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/svg+xml": ".svg",
+}
+
+
+def default_base_url():
+    """LOGO_BASE_URL, else the raw GitHub URL of output/logos/ when run from Actions, else ''"""
+    if LOGO_BASE_URL:
+        return LOGO_BASE_URL
+    repo = os.getenv("GITHUB_REPOSITORY")
+    if repo:
+        ref = os.getenv("GITHUB_REF_NAME") or "main"
+        return f"https://raw.githubusercontent.com/{repo}/{ref}/output/logos/"
+    return ""
+
+
+# ─── Logo Store ───────────────────────────────────────────────────────────────
+
+class LogoStore:
+    def __init__(self, logo_dir="output/logos", base_url=None,
+                 ttl_days=7, max_workers=16, max_size=256, timeout=10, max_bytes=MAX_LOGO_BYTES):
+        base_url = base_url if base_url is not None else default_base_url()
+        if not base_url.startswith(("http://", "https://")):
+            raise ValueError("LogoStore needs an absolute base_url (set LOGO_BASE_URL)")
+        self.logo_dir = Path(logo_dir)
+        self.logo_dir.mkdir(parents=True, exist_ok=True)
+        self.base_url = base_url.rstrip("/") + "/"
+        self.ttl = timedelta(days=ttl_days)
+        self.max_workers = max_workers
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.index_path = self.logo_dir / INDEX_NAME
+        self.index = self._load_index()
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+            self._session.headers.update(HEADERS)
+        return self._session
+
+    def _load_index(self):
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Logo index unreadable, starting fresh: {e}")
+        return {}
+
+    def _save_index(self):
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+
+    def _is_fresh(self, url):
+        entry = self.index.get(url)
+        if not entry:
+            return False
+        if entry.get("file") and not (self.logo_dir / entry["file"]).exists():
+            return False
+        checked = datetime.fromisoformat(entry["checked_at"].rstrip("Z"))
+        return datetime.utcnow() - checked < self.ttl
+
+    def check(self, url):
+        """HEAD-check a logo URL; return its image content type, or None"""
+        try:
+            resp = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+            if resp.status_code == 405:
+                resp = self.session.get(url, timeout=self.timeout, stream=True)
+                resp.close()
+        except Exception as e:
+            logger.debug(f"Logo check failed for {url}: {e}")
+            return None
+        content_type = resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if resp.status_code != 200 or not content_type.startswith("image/"):
+            return None
+        return content_type
+
+    def fetch(self, url):
+        """Verify, download and store one logo. Returns its index entry."""
+        entry = {"checked_at": datetime.utcnow().isoformat() + "Z", "file": None}
+        content_type = self.check(url)
+        if not content_type:
+            return entry
+        try:
+            raw = self._download(url)
+        except Exception as e:
+            logger.debug(f"Logo download failed for {url}: {e}")
+            return entry
+        if raw is None:
+            logger.debug(f"Logo too large, skipped: {url}")
+            return entry
+
+        data, ext = self._normalize(raw, CONTENT_TYPE_EXT.get(content_type, ".img"))
+        if data is None:
+            return entry
+        name = hashlib.sha256(data).hexdigest()[:20] + ext
+        path = self.logo_dir / name
+        if not path.exists():  # identical images share one file
+            path.write_bytes(data)
+        entry["file"] = name
+        return entry
+
+    def _download(self, url):
+        """Stream a logo into memory; None once it exceeds max_bytes"""
+        with self.session.get(url, timeout=self.timeout, stream=True) as resp:
+            resp.raise_for_status()
+            if int(resp.headers.get("Content-Length") or 0) > self.max_bytes:
+                return None
+            chunks = []
+            size = 0
+            for chunk in resp.iter_content(chunk_size=65536):
+                size += len(chunk)
+                if size > self.max_bytes:
+                    return None
+                chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _normalize(self, data, ext):
+        """Downscale raster images to max_size; keep data as-is without Pillow"""
+        if Image is None or ext == ".svg":
+            return data, ext
+        try:
+            img = Image.open(BytesIO(data))
+            img.load()
+        except Exception:
+            return None, ext  # not a decodable image
+        if max(img.size) > self.max_size:
+            img.thumbnail((self.max_size, self.max_size))
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+        out = BytesIO()
+        img.save(out, format="PNG", optimize=True)
+        return out.getvalue(), ".png"
+
+    def placeholder_url(self):
+        path = self.logo_dir / PLACEHOLDER_NAME
+        if not path.exists():
+            path.write_bytes(_placeholder_png())
+        return self.base_url + PLACEHOLDER_NAME
+
+    def process_channels(self, channels):
+        """Verify every channel logo and rewrite it to the cached copy or placeholder"""
+        urls = sorted({ch["logo"] for ch in channels
+                       if ch.get("logo", "").startswith("http") and not ch["logo"].startswith(self.base_url)})
+        stale = [u for u in urls if not self._is_fresh(u)]
+
+        if stale:
+            logger.info(f"Logos: checking {len(stale)} URLs ({len(urls) - len(stale)} cached)")
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                for url, entry in zip(stale, pool.map(self.fetch, stale)):
+                    self.index[url] = entry
+            self._save_index()
+
+        placeholder = self.placeholder_url()
+        cached = 0
+        for ch in channels:
+            entry = self.index.get(ch.get("logo", ""))
+            if entry and entry.get("file"):
+                ch["logo"] = self.base_url + entry["file"]
+                cached += 1
+            elif not ch.get("logo", "").startswith(self.base_url):
+                ch["logo"] = placeholder
+
+        in_use = {ch["logo"][len(self.base_url):] for ch in channels
+                  if ch.get("logo", "").startswith(self.base_url)}
+        self._prune(urls, in_use)
+        logger.info(f"Logos: {cached}/{len(channels)} channels use cached logos "
+                    f"({len(in_use - {PLACEHOLDER_NAME})} unique images), rest use placeholder")
+        return channels
+
+    def _prune(self, urls, in_use):
+        """
+        Forget index entries for logo URLs no channel lists any more and delete
+        stored images no channel points at, so output/logos (committed on every
+        run) only holds what the current playlists use
+        """
+        urls = set(urls)
+        dropped = [url for url in self.index if url not in urls]
+        for url in dropped:
+            del self.index[url]
+        removed = 0
+        for path in self.logo_dir.iterdir():
+            if STORED_NAME_RE.match(path.name) and path.name not in in_use:
+                path.unlink()
+                removed += 1
+        if dropped or removed:
+            self._save_index()
+            logger.info(f"Logos: pruned {len(dropped)} index entries and {removed} unused images")
+
+
+def _placeholder_png(size=64, rgb=(96, 96, 96)):
+    """Build a flat grey PNG without any imaging library"""
+    row = b"\x00" + bytes(rgb) * size
+    raw = row * size
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(raw, 9)) + chunk(b"IEND", b""))
@@ -2,8 +2,13 @@
 """
 India IPTV Playlist Generator - Main Entry Point
 Usage: python main.py [--proxy] [--all] [--no-filter]
+       python main.py --from-index output/channels.json   # re-render only
 """
 
+import time
+
+_STARTED = time.perf_counter()
+
 import argparse
 import sys
 import os
@@ -36,16 +41,45 @@ def main():
     parser.add_argument("--pages", type=int, default=5, help="Max pages to scrape (default: 5)")
     parser.add_argument("--no-split", action="store_true", help="Don't generate per-category playlists")
     parser.add_argument("--no-cf-worker", action="store_true", help="Skip generating Cloudflare Worker file")
+    parser.add_argument("--parse-workers", type=int, default=0, help="Parse HTML in N worker processes (default: 0 = inline)")
+    parser.add_argument("--fetch-workers", type=int, default=4, help="Concurrent page downloads with --parse-workers (default: 4)")
+    parser.add_argument("--http2", action="store_true", help="Use HTTP/2 multiplexing (needs httpx[http2])")
+    parser.add_argument("--no-schedule", action="store_true", help="Revisit every detail page instead of only the due ones")
+    parser.add_argument("--request-budget", type=int, help="Max detail pages to fetch per run (default: all due)")
+    parser.add_argument("--recheck-dead", action="store_true", help="Retry every URL in the dead-link cache this run")
+    parser.add_argument("--shards", type=int, default=1, help="Scrape with N parallel worker processes (default: 1)")
+    parser.add_argument("--shard-by", choices=["pages", "links"], default="pages", help="Partition shards by page, or by detail-link hash (every shard fetches every listing page)")
+    parser.add_argument("--from-shards", metavar="DIR", help="Skip scraping and merge shard_*.json partials from DIR (e.g. CI matrix jobs)")
+    parser.add_argument("--from-index", metavar="JSON", help="Skip scraping and re-render all outputs from a previous channels.json")
+    parser.add_argument("--no-hls", action="store_true", help="Skip HLS master-playlist analysis and SD/HD playlists")
+    parser.add_argument("--no-logos", action="store_true", help="Skip logo verification and the local logo cache")
+    parser.add_argument("--no-delta", action="store_true", help="Don't publish the delta feed in output/delta/")
+    parser.add_argument("--epg", action="store_true", help="Build the EPG index and output/now_next.json from EPG_SOURCES")
+    parser.add_argument("--compact", action="store_true", help="Also write minified/columnar/NDJSON indexes and .gz/.br playlists")
+    parser.add_argument("--stream", action="store_true", help="Write playlists incrementally while scraping (skips history, HLS, logos, delta, EPG, compact, README)")
+    parser.add_argument("--history", default="output/history.db", help="SQLite channel history store (default: output/history.db)")
+    parser.add_argument("--no-history", action="store_true", help="Don't record or rank by channel history")
     args = parser.parse_args()
 
     logger.info("=" * 60)
     logger.info("🇮🇳 India IPTV Playlist Generator Starting")
     logger.info("=" * 60)
 
+    if args.from_index:
+        run_from_index(args)
+        return
+
     # Import modules
     from scraper import IPTVCatScraper
     from generator import PlaylistGenerator
     from geobypass import apply_proxy_to_channels, generate_cloudflare_worker, generate_streamlink_script
+    from history import ChannelHistory
+    from hls import HLSAnalyzer
+    from logos import LogoStore, default_base_url
+    from shard import merge_shards, run_local, shard_files
+    from scheduler import RecrawlScheduler
+    from negcache import NegativeCache
+    from delta import assign_identities
 
     # Step 1: Generate Cloudflare Worker (for geo-bypass setup)
     if not args.no_cf_worker:
@@ -53,13 +87,55 @@ def main():
         generate_cloudflare_worker()
         generate_streamlink_script([], output_path="scripts/play_channel.sh")
 
+    if args.stream:
+        run_streaming(args)
+        return
+
+    negative_cache = None
+
     # Step 2: Scrape channels
-    logger.info("\n🔍 Scraping IPTVCat India channels...")
-    scraper = IPTVCatScraper(use_proxy=args.proxy)
-    channels = scraper.scrape(
-        max_pages=args.pages,
-        only_online=not args.all
-    )
+    if args.from_shards:
+        logger.info(f"\n🧩 Merging shard results from {args.from_shards}...")
+        channels, observed = merge_shards(shard_files(args.from_shards))
+    elif args.shards > 1:
+        logger.info(f"\n🔍 Scraping IPTVCat India channels with {args.shards} shards...")
+        channels, observed = run_local(
+            args.shards,
+            by=args.shard_by,
+            max_pages=args.pages,
+            only_online=not args.all,
+            use_proxy=args.proxy,
+            parse_workers=args.parse_workers,
+            fetch_workers=args.fetch_workers,
+            http2=args.http2,
+            schedule=not args.no_schedule,
+            request_budget=args.request_budget,
+            recheck_dead=args.recheck_dead,
+        )
+    else:
+        logger.info("\n🔍 Scraping IPTVCat India channels...")
+        negative_cache = NegativeCache(recheck=args.recheck_dead)
+        scraper = IPTVCatScraper(
+            use_proxy=args.proxy,
+            parse_workers=args.parse_workers,
+            fetch_workers=args.fetch_workers,
+            http2=args.http2,
+            scheduler=None if args.no_schedule else RecrawlScheduler(),
+            request_budget=args.request_budget,
+            negative_cache=negative_cache,
+        )
+        try:
+            channels = scraper.scrape(
+                max_pages=args.pages,
+                only_online=not args.all
+            )
+        finally:
+            scraper.close()
+        observed = scraper.observed
+
+    if negative_cache is None:
+        # Loaded after the merge so it includes what the shard workers recorded
+        negative_cache = NegativeCache(recheck=args.recheck_dead)
 
     if not channels:
         logger.error("No channels found! Check the scraper or try again later.")
@@ -67,27 +143,81 @@ def main():
 
     logger.info(f"\n✅ Scraped {len(channels)} channels")
 
+    # One identity per row for history, the index and the delta alike; channels
+    # are a subset of the observed rows, so they pick it up too
+    assign_identities(observed)
+
+    # Record this run's observations (including offline streams) for ranking
+    history = None
+    if not args.no_history:
+        history = ChannelHistory(args.history)
+        history.record_run(observed)
+        history.prune()
+
+    # Analyze HLS master playlists before proxy wrapping changes the URLs
+    if not args.no_hls:
+        logger.info("\n🎚️  Analyzing HLS master playlists...")
+        HLSAnalyzer(negative_cache=negative_cache).analyze_channels(channels)
+        negative_cache.save()
+
+    # Verify logos and point tvg-logo at the local cache (needs a public URL for it)
+    logo_base_url = default_base_url()
+    use_logos = not args.no_logos and bool(logo_base_url)
+    if use_logos:
+        logger.info("\n🖼️  Verifying channel logos...")
+        LogoStore(logo_dir="output/logos", base_url=logo_base_url).process_channels(channels)
+    elif not args.no_logos:
+        logger.info("\n🖼️  Skipping logo cache: set LOGO_BASE_URL to the public URL of output/logos/")
+
     # Step 3: Apply geo-bypass proxy to relevant channels
     logger.info("\n🌐 Applying geo-bypass configuration...")
     channels = apply_proxy_to_channels(channels)
 
     # Step 4: Generate playlists
     logger.info("\n📝 Generating playlists...")
-    gen = PlaylistGenerator(output_dir="output")
+    gen = PlaylistGenerator(output_dir="output", history=history)
 
     # Main all-channels playlist
     m3u_path = gen.generate_m3u(channels, filename="india_iptv.m3u")
     logger.info(f"  ✅ Main playlist: {m3u_path}")
 
     # Per-category playlists
+    playlists = [m3u_path]
     if not args.no_split:
         logger.info("  📂 Generating per-category playlists...")
         cat_files = gen.generate_m3u_by_category(channels)
+        playlists += [path for _, path, _ in cat_files]
+
+    # Per-quality playlists pointing at HLS variants
+    if not args.no_hls:
+        logger.info("  🎚️  Generating SD/HD playlists...")
+        quality_files = gen.generate_quality_playlists(channels)
+        playlists += [path for _, path, _ in quality_files]
 
     # JSON index
-    json_path = gen.generate_json_index(channels)
+    index = gen.build_index(channels)
+    json_path = gen.generate_json_index(channels, index=index)
     logger.info(f"  ✅ JSON index: {json_path}")
 
+    # Compact / precompressed artifacts
+    if args.compact:
+        logger.info("  🗜️  Generating compact artifacts...")
+        gen.generate_compact_artifacts(channels, playlists=playlists, index=index)
+
+    # Delta feed against the previous run
+    if not args.no_delta:
+        gen.generate_delta(channels)
+
+    # EPG now/next index for the resolved tvg-ids
+    if args.epg:
+        from generator import EPG_SOURCES
+        from epg import EPGIndex
+        logger.info("  📡 Building EPG now/next index...")
+        tvg_ids = {gen.get_tvg_id(ch["name"]) for ch in channels}
+        with EPGIndex("output/epg.db") as epg_index:
+            epg_index.build(EPG_SOURCES, channel_ids=tvg_ids)
+            epg_index.write_now_next(tvg_ids, path="output/now_next.json")
+
     # README
     readme_path = gen.generate_readme(channels)
     logger.info(f"  ✅ README: {readme_path}")
@@ -108,10 +238,122 @@ def main():
     logger.info(f"  output/india_iptv.m3u         - Main playlist")
     logger.info(f"  output/channels.json           - Channel index")
     logger.info(f"  output/india_*.m3u             - Per-category playlists")
+    if not args.no_delta:
+        logger.info(f"  output/delta/                  - Delta feed")
+    if args.epg:
+        logger.info(f"  output/now_next.json           - EPG now/next")
+    if not args.no_hls:
+        logger.info(f"  output/india_iptv_sd|hd.m3u    - Per-quality playlists")
+    if use_logos:
+        logger.info(f"  output/logos/                  - Cached channel logos")
     logger.info(f"  docs/cloudflare_worker.js      - Geo-bypass worker")
     logger.info(f"  scripts/play_channel.sh        - Streamlink script")
     logger.info(f"  README.md                      - Documentation")
+    if history:
+        logger.info(f"  {args.history:<30} - Channel history")
+        history.close()
+
+    logger.info("\n✅ Done! Push to GitHub to serve your playlists.")
+    logger.info("=" * 60)
+
+
+def run_from_index(args):
+    """
+    Reload channels.json → categorize → TVG-IDs → geo-bypass → generator outputs.
+    No network access; only the modules this path needs are imported. SD/HD
+    playlists need HLS variants, which the index does not keep, so they are
+    left as they are.
+    """
+    entered = time.perf_counter()
+    from generator import PlaylistGenerator, load_json_index
+    from geobypass import apply_proxy_to_channels
+    from scraper import categorize
+    imported = time.perf_counter()
+
+    logger.info(f"\n♻️  Rebuilding outputs from {args.from_index}...")
+    channels = load_json_index(args.from_index)
+    if not channels:
+        logger.error(f"No channels in {args.from_index}")
+        sys.exit(1)
+
+    # Category rules may have changed since the scrape; TVG-IDs are resolved by
+    # PlaylistGenerator.get_tvg_id when rendering, so KNOWN_TVG_IDS edits apply too
+    for ch in channels:
+        ch["category"] = categorize(ch["name"])
+    channels = apply_proxy_to_channels(channels)
 
+    history = None
+    if not args.no_history and Path(args.history).exists():
+        from history import ChannelHistory
+        history = ChannelHistory(args.history)
+
+    gen = PlaylistGenerator(output_dir="output", history=history)
+    playlists = [gen.generate_m3u(channels, filename="india_iptv.m3u")]
+    if not args.no_split:
+        playlists += [path for _, path, _ in gen.generate_m3u_by_category(channels)]
+    index = gen.build_index(channels)
+    gen.generate_json_index(channels, index=index)
+    if args.compact:
+        gen.generate_compact_artifacts(channels, playlists=playlists, index=index)
+    if not args.no_delta:
+        gen.generate_delta(channels)
+    gen.generate_readme(channels)
+    if history:
+        history.close()
+
+    done = time.perf_counter()
+    logger.info("\n" + "=" * 60)
+    logger.info(f"Rebuilt {len(channels)} channels, {len(playlists)} playlists in {(done - _STARTED) * 1000:.0f} ms "
+                f"(startup {(entered - _STARTED) * 1000:.0f} ms, imports {(imported - entered) * 1000:.0f} ms, "
+                f"render {(done - imported) * 1000:.0f} ms)")
+    logger.info("=" * 60)
+
+
+def run_streaming(args):
+    """Scrape → filter → dedup → geo-bypass → writers, one channel at a time"""
+    from scraper import IPTVCatScraper
+    from generator import PlaylistGenerator
+    from geobypass import apply_proxy_to_channels
+    from scheduler import RecrawlScheduler
+    from negcache import NegativeCache
+
+    if args.shards > 1 or args.from_shards:
+        logger.warning("--stream ignores --shards/--from-shards; scraping in this process")
+
+    logger.info("\n🔍 Streaming IPTVCat India channels into playlists...")
+    negative_cache = NegativeCache(recheck=args.recheck_dead)
+    scraper = IPTVCatScraper(
+        use_proxy=args.proxy,
+        parse_workers=args.parse_workers,
+        fetch_workers=args.fetch_workers,
+        http2=args.http2,
+        scheduler=None if args.no_schedule else RecrawlScheduler(),
+        request_budget=args.request_budget,
+        negative_cache=negative_cache,
+    )
+    channels = scraper.iter_channels(max_pages=args.pages, only_online=not args.all)
+    channels = apply_proxy_to_channels(channels)
+
+    gen = PlaylistGenerator(output_dir="output")
+    try:
+        summary = gen.generate_streaming(channels, filename="india_iptv.m3u", split=not args.no_split)
+    finally:
+        scraper.close()
+
+    if not summary["total"]:
+        logger.error("No channels found! Check the scraper or try again later.")
+        sys.exit(1)
+
+    logger.info("\n" + "=" * 60)
+    logger.info("📊 SUMMARY")
+    logger.info("=" * 60)
+    logger.info(f"Total channels: {summary['total']}")
+    logger.info("\nBy category:")
+    for cat, count in sorted(summary["categories"].items(), key=lambda x: -x[1]):
+        logger.info(f"  {cat:<30} {count:>3} channels")
+    logger.info("\n📁 Output files:")
+    for _, path, count in summary["files"]:
+        logger.info(f"  {path:<30} - {count} channels")
     logger.info("\n✅ Done! Push to GitHub to serve your playlists.")
     logger.info("=" * 60)
 
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Stream Health Monitor
+Keeps polling the media playlist of every channel in channels.json with
+staggered asyncio checks, flags stalls (media sequence not advancing) and
+segment errors, and rewrites india_iptv_live.m3u as streams go up and down
+
+Usage:
+  python monitor.py                              # run until interrupted
+  python monitor.py --duration 600 --interval 20 # e.g. as a CI step
+"""
+
+import os
+import ssl
+import json
+import heapq
+import random
+import asyncio
+import argparse
+import logging
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+from hls import HEADERS, parse_master_playlist, parse_media_playlist
+
+logger = logging.getLogger(__name__)
+
+# ─── Configuration ────────────────────────────────────────────────────────────
+
+DEFAULT_INDEX_PATH = "output/channels.json"
+LIVE_PLAYLIST = "india_iptv_live.m3u"
+STATUS_FILE = "live_status.json"
+
+DEFAULT_INTERVAL = 30          # seconds between polls of one stream
+DEFAULT_CONCURRENCY = 100      # requests in flight across all streams
+DEFAULT_TIMEOUT = 10           # per request, connect to last byte
+DEFAULT_FLUSH_INTERVAL = 5     # seconds between live playlist rewrites
+
+MAX_PLAYLIST_BYTES = 512 * 1024
+MAX_REDIRECTS = 3
+ERROR_THRESHOLD = 2            # consecutive failed polls before a stream goes offline
+STALL_TARGET_DURATIONS = 3     # no new segment for this many target durations = stalled
+MIN_STALL_SECONDS = 30
+OFFLINE_BACKOFF = 2            # offline streams are polled this much less often
+JITTER = 0.1
+
+_SSL_CONTEXT = ssl.create_default_context()
+
+
+class FetchError(Exception):
+    pass
+
+
+# ─── HTTP ─────────────────────────────────────────────────────────────────────
+
+async def http_get(url, read_body=True, max_bytes=MAX_PLAYLIST_BYTES, redirects=MAX_REDIRECTS):
+    """
+    Minimal HTTP/1.0 GET on a fresh connection. Returns (status, final_url, body);
+    with read_body=False only the status line and headers are read.
+    """
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError as e:
+        raise FetchError(f"malformed URL {url!r}: {e}")
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise FetchError(f"unsupported URL: {url}")
+    https = parts.scheme == "https"
+    port = port or (443 if https else 80)
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, port,
+        ssl=_SSL_CONTEXT if https else None,
+        server_hostname=parts.hostname if https else None,
+    )
+    try:
+        writer.write(
+            f"GET {target} HTTP/1.0\r\n"
+            f"Host: {parts.netloc}\r\n"
+            f"User-Agent: {HEADERS['User-Agent']}\r\n"
+            f"Accept: */*\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1")
+        )
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        try:
+            status = int(status_line.split(" ", 2)[1])
+        except (IndexError, ValueError):
+            raise FetchError(f"bad status line: {status_line!r}")
+        headers = {}
+        for line in header_lines:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+
+        if status in (301, 302, 303, 307, 308) and headers.get("location"):
+            if redirects <= 0:
+                raise FetchError("too many redirects")
+            writer.close()
+            return await http_get(urljoin(url, headers["location"]), read_body, max_bytes, redirects - 1)
+
+        body = b""
+        if read_body:
+            chunks = []
+            size = 0
+            while size < max_bytes:
+                chunk = await reader.read(min(65536, max_bytes - size))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+            body = b"".join(chunks)
+        return status, url, body.decode("utf-8", errors="replace")
+    finally:
+        writer.close()
+
+
+# ─── Stream State ─────────────────────────────────────────────────────────────
+
+class StreamState:
+    """Per-stream counters; playlist bodies are never kept"""
+
+    __slots__ = ("channel", "media_url", "position", "progress_at", "last_segment",
+                 "errors", "online", "reason", "changed_at", "due")
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.media_url = None      # resolved variant when the channel URL is a master playlist
+        self.position = None       # media sequence + segment count of the last poll
+        self.progress_at = None
+        self.last_segment = None
+        self.errors = 0
+        self.online = bool(channel.get("is_online", True))
+        self.reason = None
+        self.changed_at = None
+        self.due = None
+
+
+# ─── Monitor ──────────────────────────────────────────────────────────────────
+
+class StreamMonitor:
+    def __init__(self, index_path=DEFAULT_INDEX_PATH, output_dir="output", interval=DEFAULT_INTERVAL,
+                 concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.index_path = Path(index_path)
+        self.output_dir = Path(output_dir)
+        self.interval = interval
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self.streams = {}          # stream URL -> StreamState
+        self.heap = []             # (due, url); stale entries are skipped on pop
+        self.dirty = False
+        self.polls = 0
+        self._index_mtime = None
+
+    # ── Channel set ──
+
+    def reload_index(self, now):
+        """(Re)load channels.json, keeping state for streams that are still listed"""
+        from generator import load_json_index
+        mtime = self.index_path.stat().st_mtime
+        if mtime == self._index_mtime:
+            return False
+        channels = [ch for ch in load_json_index(self.index_path) if ch.get("stream_url")]
+        # Only after a successful load, so a half-written index is retried next time
+        self._index_mtime = mtime
+        listed = {ch["stream_url"] for ch in channels}
+        for url in [u for u in self.streams if u not in listed]:
+            del self.streams[url]
+
+        new = [ch for ch in channels if ch["stream_url"] not in self.streams]
+        # Stagger first polls evenly over one interval so load stays flat
+        step = self.interval / max(len(new), 1)
+        for i, ch in enumerate(new):
+            state = StreamState(ch)
+            self.streams[ch["stream_url"]] = state
+            self._schedule(ch["stream_url"], state, now + i * step)
+        for ch in channels:
+            self.streams[ch["stream_url"]].channel = ch
+
+        self.dirty = True
+        logger.info(f"Monitor: watching {len(self.streams)} streams ({len(new)} new) from {self.index_path}")
+        return True
+
+    def _schedule(self, url, state, due):
+        state.due = due
+        heapq.heappush(self.heap, (due, url))
+
+    def _next_delay(self, state):
+        delay = self.interval if state.online else self.interval * OFFLINE_BACKOFF
+        return delay * random.uniform(1 - JITTER, 1 + JITTER)
+
+    # ── Checks ──
+
+    async def check(self, url, state):
+        """Poll one stream and update its online flag"""
+        self.polls += 1
+        now = time.monotonic()
+        try:
+            problem = await asyncio.wait_for(self._poll(url, state, now), self.timeout)
+        except asyncio.TimeoutError:
+            problem = "timeout"
+        except (OSError, FetchError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ValueError) as e:
+            # ValueError covers UnicodeError from IDNA-encoding a bad hostname
+            problem = f"{type(e).__name__}: {e}"
+
+        if problem == "stalled":
+            # A frozen sequence is already confirmed by the stall window
+            online = False
+        elif problem:
+            state.errors += 1
+            # Re-resolve the master next time in case the variant URL expired
+            state.media_url = None
+            online = state.errors < ERROR_THRESHOLD and state.online
+        else:
+            state.errors = 0
+            online = True
+        self._set_online(state, online, problem)
+
+    async def _poll(self, url, state, now):
+        """Return None when healthy, otherwise a short reason"""
+        status, final_url, text = await http_get(state.media_url or url)
+        if status >= 400:
+            return f"HTTP {status}"
+        if "#EXTM3U" not in text[:1024]:
+            return "not a playlist"
+
+        if state.media_url is None:
+            variants = parse_master_playlist(text, base_url=final_url)
+            if variants:
+                # The cheapest variant advances exactly like the others
+                state.media_url = variants[0]["url"]
+                status, final_url, text = await http_get(state.media_url)
+                if status >= 400:
+                    return f"variant HTTP {status}"
+            else:
+                state.media_url = final_url
+
+        info = parse_media_playlist(text)
+        if info["ended"]:
+            return None  # VOD / ended event: playable, nothing to advance
+        if not info["segments"]:
+            return "no segments"
+
+        position = info["media_sequence"] + info["segments"]
+        # Any change counts: encoder restarts reset the media sequence
+        if position != state.position:
+            state.position = position
+            state.progress_at = now
+        else:
+            target = info["target_duration"] or 10
+            if now - state.progress_at > max(MIN_STALL_SECONDS, target * STALL_TARGET_DURATIONS):
+                return "stalled"
+
+        segment_url = urljoin(final_url, info["last_segment"])
+        if segment_url != state.last_segment:
+            # Each new segment is probed once, headers only
+            state.last_segment = segment_url
+            seg_status, _, _ = await http_get(segment_url, read_body=False)
+            if seg_status >= 400:
+                return f"segment HTTP {seg_status}"
+        return None
+
+    def _set_online(self, state, online, reason):
+        state.reason = reason
+        if online == state.online:
+            return
+        state.online = online
+        state.changed_at = time.time()
+        self.dirty = True
+        name = state.channel.get("name", "?")
+        if online:
+            logger.info(f"🟢 {name} back online")
+        else:
+            logger.info(f"🔴 {name} offline ({reason})")
+
+    # ── Output ──
+
+    def flush(self):
+        """Rewrite the live playlist and status file (atomically) if anything changed"""
+        if not self.dirty:
+            return
+        self.dirty = False
+        from generator import PlaylistGenerator
+
+        online = [state.channel for state in self.streams.values() if state.online]
+        gen = PlaylistGenerator(self.output_dir)
+        tmp = gen.generate_m3u(online, filename=LIVE_PLAYLIST + ".tmp")
+        os.replace(tmp, self.output_dir / LIVE_PLAYLIST)
+
+        status = {
+            "generated_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "online": len(online),
+            "offline": len(self.streams) - len(online),
+            "streams": {
+                url: {
+                    "name": state.channel.get("name"),
+                    "is_online": state.online,
+                    "reason": state.reason,
+                    "changed_at": state.changed_at,
+                }
+                for url, state in self.streams.items()
+            },
+        }
+        path = self.output_dir / STATUS_FILE
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(status, f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp, path)
+
+    # ── Loop ──
+
+    async def run(self, duration=None):
+        """Poll until cancelled (or for duration seconds), flushing every flush_interval"""
+        loop = asyncio.get_running_loop()
+        self.reload_index(loop.time())
+        queue = asyncio.Queue(maxsize=self.concurrency)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+        flusher = asyncio.create_task(self._flush_loop())
+        deadline = loop.time() + duration if duration else None
+        try:
+            while deadline is None or loop.time() < deadline:
+                wait = self.heap[0][0] - loop.time() if self.heap else self.interval
+                if deadline is not None:
+                    wait = min(wait, deadline - loop.time())
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                due, url = heapq.heappop(self.heap)
+                state = self.streams.get(url)
+                if state is not None and state.due == due:
+                    # Blocks while every worker is busy, which bounds in-flight work
+                    await queue.put(url)
+        finally:
+            for task in workers + [flusher]:
+                task.cancel()
+            await asyncio.gather(*workers, flusher, return_exceptions=True)
+            self.flush()
+            online = sum(1 for s in self.streams.values() if s.online)
+            logger.info(f"Monitor: {self.polls} polls, {online}/{len(self.streams)} streams online")
+
+    async def _worker(self, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            url = await queue.get()
+            state = self.streams.get(url)
+            if state is None:
+                continue
+            try:
+                await self.check(url, state)
+            except Exception as e:
+                # One bad stream must never take a worker down with it
+                logger.exception(f"Monitor: check of {url} failed")
+                state.errors += 1
+                self._set_online(state, False, f"{type(e).__name__}: {e}")
+            self._schedule(url, state, loop.time() + self._next_delay(state))
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.reload_index(loop.time())
+            except (OSError, ValueError) as e:
+                logger.warning(f"Monitor: could not reload {self.index_path}: {e}")
+            self.flush()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Continuous HLS stream health monitor")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help=f"Channel index (default: {DEFAULT_INDEX_PATH})")
+    parser.add_argument("--output", default="output", help="Output directory for the live playlist and status")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="Seconds between polls of one stream")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Max requests in flight")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Per-poll timeout in seconds")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds (default: run forever)")
+    args = parser.parse_args()
+
+    monitor = StreamMonitor(
+        index_path=args.index,
+        output_dir=args.output,
+        interval=args.interval,
+        concurrency=args.concurrency,
+        timeout=args.timeout,
+    )
+    try:
+        asyncio.run(monitor.run(duration=args.duration))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Negative Cache
+Remembers failed URLs and hosts with exponentially growing expiry so dead
+detail pages, iframe embeds and stream hosts are skipped until they are
+worth retrying. Old entries are folded into compact Bloom filters.
+"""
+
+import os
+import json
+import math
+import base64
+import hashlib
+import logging
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# ─── Configuration ────────────────────────────────────────────────────────────
+
+DEFAULT_CACHE_PATH = "output/dead_links.json"
+
+BASE_TTL = 6 * 60 * 60              # first failure: skip for one run
+MAX_TTL = 30 * 24 * 60 * 60         # never skip longer than a month
+HOST_THRESHOLD = 3                  # connection failures before a whole host is skipped
+MAX_ENTRIES = 5000                  # exact entries kept before folding into Bloom filters
+BLOOM_FP_RATE = 0.001
+BLOOM_BUCKET = 24 * 60 * 60         # entries expiring in the same day share a filter
+
+
+def expiry_for(failures, now):
+    return now + min(MAX_TTL, BASE_TTL * 2 ** (failures - 1))
+
+
+# ─── Bloom Filter ─────────────────────────────────────────────────────────────
+
+class BloomFilter:
+    def __init__(self, size_bits, num_hashes, bits=None):
+        self.size_bits = size_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((size_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, fp_rate=BLOOM_FP_RATE):
+        capacity = max(capacity, 1)
+        size_bits = max(64, int(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        num_hashes = max(1, round(size_bits / capacity * math.log(2)))
+        return cls(size_bits, num_hashes)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.size_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def to_dict(self):
+        return {"m": self.size_bits, "k": self.num_hashes,
+                "bits": base64.b64encode(bytes(self.bits)).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["m"], data["k"], bytearray(base64.b64decode(data["bits"])))
+
+
+# ─── Cache ────────────────────────────────────────────────────────────────────
+
+class NegativeCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, recheck=False, max_entries=MAX_ENTRIES, save_path=None):
+        """
+        With recheck=True nothing is skipped, but failures and recoveries are
+        still recorded. save_path (default: path) lets shard workers read the
+        shared cache but save their own file (see merge_caches).
+        """
+        self.path = Path(path)
+        self.save_path = Path(save_path) if save_path else self.path
+        self.recheck = recheck
+        self.max_entries = max_entries
+        self.urls = {}
+        self.hosts = {}
+        self.blooms = []  # [{"expires", "failures", "filter": BloomFilter}]
+        self.recovered = set()  # folded URLs that have since succeeded
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Negative cache unreadable, starting fresh: {e}")
+            return
+        now = time.time()
+        # Expired entries are kept a while longer so repeat failures keep backing off
+        self.urls = {u: e for u, e in data.get("urls", {}).items() if e["last"] + MAX_TTL > now}
+        self.hosts = {h: e for h, e in data.get("hosts", {}).items() if e["last"] + MAX_TTL > now}
+        self.blooms = [dict(b, filter=BloomFilter.from_dict(b["filter"]))
+                       for b in data.get("blooms", []) if b["expires"] + MAX_TTL > now]
+        self.recovered = set(data.get("recovered", []))
+
+    def save(self):
+        with self._lock:
+            self._compact()
+        self._write(self.save_path)
+        logger.info(f"Negative cache: skipped {self.skipped} dead targets; tracking {len(self.urls)} URLs, "
+                    f"{len(self.hosts)} hosts, {len(self.blooms)} Bloom filters, {len(self.recovered)} recoveries")
+
+    def _write(self, path):
+        with self._lock:
+            data = {
+                "urls": self.urls,
+                "hosts": self.hosts,
+                "blooms": [dict(b, filter=b["filter"].to_dict()) for b in self.blooms],
+                "recovered": sorted(self.recovered),
+            }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp, path)
+
+    def _compact(self):
+        """
+        Fold the longest-lived entries beyond max_entries into Bloom filters, one
+        per (expiry day, failure count), and forget recoveries no filter needs
+        """
+        self.recovered = {url for url in self.recovered
+                          if any(url in b["filter"] for b in self.blooms)}
+        if len(self.urls) <= self.max_entries:
+            return
+        by_expiry = sorted(self.urls.items(), key=lambda item: item[1]["expires"])
+        keep, fold = by_expiry[:self.max_entries // 2], by_expiry[self.max_entries // 2:]
+
+        buckets = {}
+        for url, entry in fold:
+            # Round up so a filter never expires before any of its members
+            expires = math.ceil(entry["expires"] / BLOOM_BUCKET) * BLOOM_BUCKET
+            buckets.setdefault((expires, entry["failures"]), []).append(url)
+        for (expires, failures), urls in buckets.items():
+            bf = BloomFilter.for_capacity(len(urls))
+            for url in urls:
+                bf.add(url)
+                self.recovered.discard(url)
+            self.blooms.append({"expires": expires, "failures": failures, "filter": bf})
+
+        self.urls = dict(keep)
+        logger.info(f"Negative cache: folded {len(fold)} entries into {len(buckets)} Bloom filters")
+
+    def _folded_failures(self, url):
+        """Failure count recorded for url in the Bloom filters (0 if absent or recovered)"""
+        if url in self.recovered:
+            return 0
+        return max((b["failures"] for b in self.blooms if url in b["filter"]), default=0)
+
+    def is_dead(self, url, now=None):
+        """True if url (or its host) failed recently and has not expired yet"""
+        if self.recheck:
+            return False
+        now = now if now is not None else time.time()
+        with self._lock:
+            entry = self.urls.get(url)
+            if entry is not None:
+                dead = entry["expires"] > now
+            else:
+                # Only URLs without an exact entry fall back to the folded filters
+                dead = url not in self.recovered and any(
+                    b["expires"] > now and url in b["filter"] for b in self.blooms)
+            if not dead:
+                host = self.hosts.get(urlparse(url).hostname or "")
+                dead = bool(host and host["failures"] >= HOST_THRESHOLD and host["expires"] > now)
+            if dead:
+                self.skipped += 1
+        return dead
+
+    def record_failure(self, url, host_level=False, now=None):
+        """
+        Record a failed fetch. host_level marks failures with no HTTP response
+        (DNS, connect, TLS, timeout) which count against the whole host.
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            if url not in self.urls:
+                # Continue the backoff of a folded entry instead of restarting at 1
+                failures = self._folded_failures(url)
+                if failures:
+                    self.urls[url] = {"failures": failures}
+                self.recovered.discard(url)
+            self._bump(self.urls, url, now)
+            if host_level:
+                host = urlparse(url).hostname
+                if host:
+                    self._bump(self.hosts, host, now)
+
+    def record_success(self, url):
+        with self._lock:
+            self.urls.pop(url, None)
+            self.hosts.pop(urlparse(url).hostname or "", None)
+            if any(url in b["filter"] for b in self.blooms):
+                self.recovered.add(url)
+
+    @staticmethod
+    def _bump(table, key, now):
+        entry = table.get(key) or {"failures": 0}
+        entry["failures"] += 1
+        entry["last"] = now
+        entry["expires"] = expiry_for(entry["failures"], now)
+        table[key] = entry
+
+
+def _merge_table(base, shards):
+    """
+    Apply each shard's changes to a urls/hosts table. Every shard started from
+    base, so a missing key was recovered in that shard and a differing entry was
+    updated there; the later failure wins when two shards touched the same key.
+    """
+    merged = dict(base)
+    for table in shards:
+        for key in base.keys() - table.keys():
+            merged.pop(key, None)
+        for key, entry in table.items():
+            if base.get(key) == entry:
+                continue
+            current = merged.get(key)
+            if current is None or entry["last"] >= current["last"]:
+                merged[key] = entry
+    return merged
+
+
+def merge_caches(paths, path=DEFAULT_CACHE_PATH):
+    """Fold per-shard cache files (written with save_path) back into the shared cache at path"""
+    merged = NegativeCache(path)
+    shards = [NegativeCache(p) for p in paths]
+    merged.urls = _merge_table(merged.urls, [c.urls for c in shards])
+    merged.hosts = _merge_table(merged.hosts, [c.hosts for c in shards])
+
+    seen = {(b["expires"], b["failures"], bytes(b["filter"].bits)) for b in merged.blooms}
+    for cache in shards:
+        merged.recovered |= cache.recovered
+        for bloom in cache.blooms:
+            key = (bloom["expires"], bloom["failures"], bytes(bloom["filter"].bits))
+            if key not in seen:
+                seen.add(key)
+                merged.blooms.append(bloom)
+
+    merged._write(merged.path)
+    logger.info(f"Negative cache: merged {len(paths)} shard caches ({len(merged.urls)} URLs, "
+                f"{len(merged.hosts)} hosts tracked)")
+    return merged
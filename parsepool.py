@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Parser Pool
+Decouples network I/O from HTML parsing: fetcher threads download raw
+bytes, hand them to a pool of parser processes and move on to the next
+URL, so parsing scales with cores while the network waits continue in
+parallel
+"""
+
+import os
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FETCH_WORKERS = 4
+
+
+def _noop():
+    return None
+
+
+def _mp_context():
+    # Forking a process that already runs fetcher threads can deadlock on locks
+    # held by those threads; forkserver/spawn children start from a clean process
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class ParserPool:
+    def __init__(self, fetch, workers=None, fetch_workers=DEFAULT_FETCH_WORKERS, max_pending=None):
+        """
+        fetch(url) -> bytes or None is called on fetcher threads.
+        At most max_pending documents are queued for or being parsed; fetchers
+        block once that many are outstanding, which bounds memory when the
+        network is faster than the parsers.
+        """
+        self.fetch = fetch
+        self.workers = workers or os.cpu_count() or 1
+        self.fetch_workers = fetch_workers
+        self.max_pending = max_pending or self.workers * 2
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._parsers = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+        # Start the parser side before any fetcher thread exists
+        self._parsers.submit(_noop).result()
+        self._fetchers = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="fetch")
+        logger.info(f"Parser pool: {self.workers} parser processes, {fetch_workers} fetchers, "
+                    f"{self.max_pending} pending documents max")
+
+    def submit(self, func, data):
+        """Queue func(data) on a parser process and return its future without waiting"""
+        self._slots.acquire()
+        try:
+            future = self._parsers.submit(func, data)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _fetch_and_submit(self, func, item, fetch):
+        data = fetch(item)
+        if data is None:
+            return None
+        return self.submit(func, data)
+
+    @staticmethod
+    def _result(future):
+        parsed = future.result()
+        return parsed.result() if parsed is not None else None
+
+    def map(self, func, items, fetch=None):
+        """
+        Fetch every item (a URL for the default self.fetch; whatever fetch
+        accepts otherwise) and parse it with func. Yields results in input
+        order, None on fetch failure. Fetchers only download and submit, so up
+        to max_pending parses run at once. Only fetch_workers + max_pending
+        items are in flight or awaiting the consumer, so downloaded pages and
+        parse results never pile up ahead of the caller.
+        """
+        fetch = fetch or self.fetch
+        window = self.fetch_workers + self.max_pending
+        pending = deque()
+        for item in items:
+            pending.append(self._fetchers.submit(self._fetch_and_submit, func, item, fetch))
+            if len(pending) >= window:
+                yield self._result(pending.popleft())
+        while pending:
+            yield self._result(pending.popleft())
+
+    def close(self):
+        self._fetchers.shutdown(wait=True)
+        self._parsers.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
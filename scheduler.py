@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Adaptive Recrawl Scheduler
+Tracks how often each detail link's resolved stream URL changes and only
+revisits links whose adaptive interval has elapsed, most overdue first
+"""
+
+import os
+import json
+import heapq
+import logging
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# ─── Configuration ────────────────────────────────────────────────────────────
+
+DEFAULT_STATE_PATH = "output/recrawl_state.json"
+
+MIN_INTERVAL = 60 * 60              # volatile links: due on every run
+MAX_INTERVAL = 14 * 24 * 60 * 60    # stable links: at least every two weeks
+INITIAL_INTERVAL = 6 * 60 * 60      # matches the workflow's 6-hour schedule
+SPEEDUP = 0.5                       # interval multiplier when the URL changed
+BACKOFF = 1.5                       # interval multiplier when it did not
+
+
+class RecrawlScheduler:
+    def __init__(self, state_path=DEFAULT_STATE_PATH, save_path=None):
+        self.state_path = Path(state_path)
+        # Shard workers read the shared state but save their own file (see merge_states)
+        self.save_path = Path(save_path) if save_path else self.state_path
+        self.entries = self._load()
+        self.fetched = 0
+        self.reused = 0
+        self._lock = threading.Lock()  # observe() is called from fetcher threads
+
+    def _load(self):
+        if self.state_path.exists():
+            try:
+                with open(self.state_path, encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Recrawl state unreadable, starting fresh: {e}")
+        return {}
+
+    def save(self):
+        self._write(self.save_path)
+        logger.info(f"Recrawl: {self.fetched} detail pages fetched, {self.reused} reused from cache "
+                    f"({len(self.entries)} links tracked)")
+
+    def _write(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp, path)
+
+    def cached_url(self, link):
+        entry = self.entries.get(link)
+        return entry["url"] if entry else None
+
+    def plan(self, links, budget=None, now=None):
+        """
+        Return the subset of links to fetch now: every due link, most overdue
+        (relative to its interval) first, capped at budget. Unknown links and
+        links without a cached URL come first.
+        """
+        now = now if now is not None else time.time()
+        queue = []
+        for link in set(links):
+            entry = self.entries.get(link)
+            if not entry or not entry.get("url"):
+                heapq.heappush(queue, (float("-inf"), link))
+                continue
+            overdue = now - (entry["last_checked"] + entry["interval"])
+            if overdue >= 0:
+                heapq.heappush(queue, (-overdue / entry["interval"], link))
+
+        selected = set()
+        while queue and (budget is None or len(selected) < budget):
+            selected.add(heapq.heappop(queue)[1])
+        return selected
+
+    def observe(self, link, url, now=None):
+        """Record a fresh resolution of link and adapt its revisit interval"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            self._observe(link, url, now)
+
+    def _observe(self, link, url, now):
+        self.fetched += 1
+        entry = self.entries.get(link)
+        if entry is None:
+            self.entries[link] = {"url": url, "interval": INITIAL_INTERVAL, "last_checked": now,
+                                  "checks": 1, "changes": 0}
+            return
+        entry["checks"] += 1
+        entry["last_checked"] = now
+        if url is None:
+            # Failed lookup: retry soon, keep the last good URL
+            entry["interval"] = MIN_INTERVAL
+            return
+        if url != entry["url"]:
+            entry["changes"] += 1
+            entry["interval"] = max(MIN_INTERVAL, entry["interval"] * SPEEDUP)
+            entry["url"] = url
+        else:
+            entry["interval"] = min(MAX_INTERVAL, entry["interval"] * BACKOFF)
+
+    def reuse(self, link):
+        """Cached stream URL for a link that is not due this run"""
+        url = self.cached_url(link)
+        if url:
+            self.reused += 1
+        return url
+
+
+def merge_states(paths, state_path=DEFAULT_STATE_PATH):
+    """
+    Fold per-shard state files into state_path. Every shard starts from the
+    shared state, so each link keeps whichever copy was checked most recently.
+    """
+    merged = RecrawlScheduler(state_path)
+    for path in paths:
+        for link, entry in RecrawlScheduler(path).entries.items():
+            current = merged.entries.get(link)
+            if current is None or entry["last_checked"] > current["last_checked"]:
+                merged.entries[link] = entry
+    merged._write(merged.state_path)
+    logger.info(f"Recrawl: merged {len(paths)} shard states ({len(merged.entries)} links tracked)")
+    return merged
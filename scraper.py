@@ -4,8 +4,6 @@ India IPTV Playlist Generator
 Scrapes IPTVCat for India channels, generates M3U playlist with EPG
 """
 
-import requests
-from bs4 import BeautifulSoup
 import re
 import json
 import time
@@ -14,6 +12,8 @@ from datetime import datetime
 from urllib.parse import urljoin, urlparse
 import os
 
+from shard import shard_of
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
@@ -22,17 +22,22 @@ logger = logging.getLogger(__name__)
 
 # ─── Configuration ────────────────────────────────────────────────────────────
 
-BASE_URL = "https://iptvcat.com"
-INDIA_URL = "https://iptvcat.com/india"
+# Overridable so shard workers can be pointed at a local stand-in server
+BASE_URL = os.getenv("IPTVCAT_BASE_URL", "https://iptvcat.com").rstrip("/")
+INDIA_URL = f"{BASE_URL}/india"
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
                   "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
     "Accept-Language": "en-US,en;q=0.5",
-    "Referer": "https://iptvcat.com/",
+    "Referer": f"{BASE_URL}/",
 }
 
+# Politeness: seconds between requests to one host (listing pages / detail pages)
+PAGE_DELAY = 1
+DETAIL_DELAY = 0.5
+
 # Free proxy/VPN services for geo-blocked content bypass
 PROXY_SERVICES = [
     # Add your preferred proxy here, e.g.:
@@ -100,27 +105,233 @@ CATEGORY_KEYWORDS = {
 }
 
 
+# ─── Parsing ──────────────────────────────────────────────────────────────────
+#
+# Pure functions of the page HTML (str or bytes) so they can run in a
+# ProcessPoolExecutor worker (see parsepool.py) as well as inline.
+
+M3U8_RE = re.compile(r'(https?://[^\s\'"]+\.m3u8[^\s\'"]*)')
+STREAM_VAR_RE = re.compile(r'(?:source|stream|url|src)["\s]*[:=]["\s]*(https?://[^\s\'"]+)')
+
+# Field order of the compact tuples returned by parse_channel_records
+RECORD_FIELDS = ("name", "stream_url", "detail_link", "is_online", "category", "logo", "tvg_id")
+
+
+def parse_channel_records(html):
+    """Parse channel rows from a listing page into compact tuples (see RECORD_FIELDS)"""
+    from bs4 import BeautifulSoup
+    records = []
+    soup = BeautifulSoup(html, "html.parser")
+
+    # IPTVCat table rows
+    rows = soup.select("table tbody tr") or soup.select(".channel-list tr")
+
+    if not rows:
+        # Try alternative selectors
+        rows = soup.find_all("tr")
+
+    for row in rows:
+        cols = row.find_all("td")
+        if len(cols) < 3:
+            continue
+
+        try:
+            # Extract channel name
+            name_el = cols[0].find("a") or cols[0]
+            name = name_el.get_text(strip=True)
+
+            # Extract stream URL - look for M3U8 links
+            stream_url = None
+            for col in cols:
+                links = col.find_all("a", href=True)
+                for link in links:
+                    href = link["href"]
+                    if any(x in href.lower() for x in [".m3u8", ".ts", "stream", "live"]):
+                        stream_url = href if href.startswith("http") else urljoin(BASE_URL, href)
+                        break
+                if stream_url:
+                    break
+
+            # Try to find stream URL in data attributes
+            if not stream_url:
+                for el in row.find_all(attrs={"data-url": True}):
+                    stream_url = el["data-url"]
+                    break
+
+            # Extract channel detail page link to get actual stream
+            detail_link = None
+            for a in row.find_all("a", href=True):
+                if "channel" in a["href"].lower() or name.lower().replace(" ", "-") in a["href"].lower():
+                    detail_link = urljoin(BASE_URL, a["href"])
+                    break
+
+            if not name or (not stream_url and not detail_link):
+                continue
+
+            # Status
+            status_el = row.find(class_=re.compile("online|offline|status", re.I))
+            is_online = True
+            if status_el:
+                is_online = "online" in status_el.get("class", []) or \
+                            "online" in status_el.get_text().lower()
+
+            records.append((
+                name,
+                stream_url,
+                detail_link,
+                is_online,
+                categorize(name),
+                find_logo(row, name),
+                make_tvg_id(name),
+            ))
+        except Exception as e:
+            logger.debug(f"Error parsing row: {e}")
+            continue
+
+    return records
+
+
+def parse_detail_page(html):
+    """
+    Extract the stream from a channel detail page.
+    Returns (stream_url, []) when found, else (None, iframe_srcs) to follow.
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Look for M3U8 in scripts
+    scripts = soup.find_all("script")
+    for script in scripts:
+        text = script.string or ""
+        urls = M3U8_RE.findall(text)
+        if urls:
+            return urls[0], []
+        # Also look for source/stream vars
+        matches = STREAM_VAR_RE.findall(text)
+        for m in matches:
+            if any(x in m for x in [".m3u8", "/live", "/stream", ".ts"]):
+                return m, []
+
+    # Look in video/source tags
+    for tag in soup.select("video source, source"):
+        src = tag.get("src", "")
+        if src and ("m3u8" in src or "stream" in src):
+            return src, []
+
+    # Iframes have to be fetched by the caller
+    return None, [iframe.get("src") for iframe in soup.select("iframe") if iframe.get("src")]
+
+
+def find_m3u8(html):
+    """First M3U8 URL anywhere in the document, or None"""
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", "replace")
+    urls = M3U8_RE.findall(html)
+    return urls[0] if urls else None
+
+
+def find_logo(row, name):
+    """Try to find channel logo URL"""
+    img = row.find("img")
+    if img:
+        src = img.get("src") or img.get("data-src", "")
+        if src:
+            return urljoin(BASE_URL, src)
+    # Fallback: use a logo API
+    slug = re.sub(r'[^a-z0-9]', '-', name.lower()).strip('-')
+    return f"https://raw.githubusercontent.com/uddhavz/iptv-logos/main/logos/{slug}.png"
+
+
+def categorize(name):
+    name_lower = name.lower()
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if category == "General":
+            continue
+        for kw in keywords:
+            if kw in name_lower:
+                return category
+    return "General"
+
+
+def make_tvg_id(name):
+    return re.sub(r'[^a-zA-Z0-9]', '', name).lower()
+
+
 # ─── Scraper ──────────────────────────────────────────────────────────────────
 
 class IPTVCatScraper:
-    def __init__(self, use_proxy=False):
-        self.session = requests.Session()
-        self.session.headers.update(HEADERS)
+    def __init__(self, use_proxy=False, parse_workers=0, fetch_workers=4, http2=False,
+                 scheduler=None, request_budget=None, negative_cache=None):
         self.use_proxy = use_proxy
+        # Optional negcache.NegativeCache: known-dead URLs and hosts are skipped
+        self.negative_cache = negative_cache
+        # Optional scheduler.RecrawlScheduler: only due detail links are fetched,
+        # at most request_budget per run; the rest reuse their last stream URL
+        self.scheduler = scheduler
+        self.request_budget = request_budget
+        proxies = None
         if use_proxy and PROXY_SERVICES:
             proxy = PROXY_SERVICES[0]
-            self.session.proxies = {"http": proxy, "https": proxy}
+            proxies = {"http": proxy, "https": proxy}
             logger.info(f"Using proxy: {proxy}")
+        # The listing host is hit by every fetcher thread; embed hosts get the default pool
+        from transport import DEFAULT_POOL_MAXSIZE, HostPacer, Transport
+        # Pooled fetchers share this so concurrency never speeds up requests to one host
+        self.pacer = HostPacer()
+        listing_host = urlparse(BASE_URL).hostname
+        self.transport = Transport(
+            headers=HEADERS,
+            proxies=proxies,
+            http2=http2,
+            host_pool_sizes={listing_host: max(DEFAULT_POOL_MAXSIZE, fetch_workers * 2)},
+        )
+        self.session = self.transport.session
+        # 0 parses inline on the fetching thread; N > 0 uses a pool of N parser processes
+        self.parse_workers = parse_workers
+        self.fetch_workers = fetch_workers
+        # Every parsed channel from the last scrape, before online filtering
+        self.observed = []
+
+    def close(self):
+        """Close pooled connections and release the shared DNS cache"""
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fetch_page(self, url, retries=3, raw=False, skip_dead=False):
+        """
+        Fetch a URL, returning its text (or bytes with raw=True), or None on failure.
+        With skip_dead, failures go to the negative cache and known-dead URLs are skipped.
+        """
+        cache = self.negative_cache if skip_dead else None
+        if cache is not None and cache.is_dead(url):
+            logger.debug(f"Skipping known-dead URL: {url}")
+            return None
 
-    def fetch_page(self, url, retries=3):
+        error = None
         for attempt in range(retries):
             try:
                 resp = self.session.get(url, timeout=30)
                 resp.raise_for_status()
-                return resp.text
+                if cache is not None:
+                    cache.record_success(url)
+                return resp.content if raw else resp.text
             except Exception as e:
+                error = e
                 logger.warning(f"Attempt {attempt+1} failed for {url}: {e}")
-                time.sleep(2 ** attempt)
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if status is not None and 400 <= status < 500 and status not in (408, 429):
+                    break  # client errors will not fix themselves with a retry
+                if attempt + 1 < retries:
+                    time.sleep(2 ** attempt)
+
+        if cache is not None:
+            # No HTTP response at all (DNS, connect, TLS, timeout) counts against the host
+            cache.record_failure(url, host_level=getattr(error, "response", None) is None)
         return None
 
     def get_all_pages(self):
@@ -129,6 +340,7 @@ class IPTVCatScraper:
         html = self.fetch_page(INDIA_URL)
         if not html:
             return pages
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html, "html.parser")
         # Find pagination links
         for a in soup.select("a[href]"):
@@ -141,177 +353,239 @@ class IPTVCatScraper:
 
     def parse_channels(self, html):
         """Parse channel entries from page HTML"""
-        channels = []
-        soup = BeautifulSoup(html, "html.parser")
-
-        # IPTVCat table rows
-        rows = soup.select("table tbody tr") or soup.select(".channel-list tr")
-        
-        if not rows:
-            # Try alternative selectors
-            rows = soup.find_all("tr")
-
-        for row in rows:
-            cols = row.find_all("td")
-            if len(cols) < 3:
-                continue
-
-            try:
-                # Extract channel name
-                name_el = cols[0].find("a") or cols[0]
-                name = name_el.get_text(strip=True)
-
-                # Extract stream URL - look for M3U8 links
-                stream_url = None
-                for col in cols:
-                    links = col.find_all("a", href=True)
-                    for link in links:
-                        href = link["href"]
-                        if any(x in href.lower() for x in [".m3u8", ".ts", "stream", "live"]):
-                            stream_url = href if href.startswith("http") else urljoin(BASE_URL, href)
-                            break
-                    if stream_url:
-                        break
-
-                # Try to find stream URL in data attributes
-                if not stream_url:
-                    for el in row.find_all(attrs={"data-url": True}):
-                        stream_url = el["data-url"]
-                        break
-
-                # Extract channel detail page link to get actual stream
-                detail_link = None
-                for a in row.find_all("a", href=True):
-                    if "channel" in a["href"].lower() or name.lower().replace(" ", "-") in a["href"].lower():
-                        detail_link = urljoin(BASE_URL, a["href"])
-                        break
-
-                if not name or (not stream_url and not detail_link):
-                    continue
-
-                # Status
-                status_el = row.find(class_=re.compile("online|offline|status", re.I))
-                is_online = True
-                if status_el:
-                    is_online = "online" in status_el.get("class", []) or \
-                                "online" in status_el.get_text().lower()
-
-                channels.append({
-                    "name": name,
-                    "stream_url": stream_url,
-                    "detail_link": detail_link,
-                    "is_online": is_online,
-                    "category": self.categorize(name),
-                    "logo": self.find_logo(row, name),
-                    "tvg_id": self.make_tvg_id(name),
-                })
-            except Exception as e:
-                logger.debug(f"Error parsing row: {e}")
-                continue
-
-        return channels
+        return [dict(zip(RECORD_FIELDS, rec)) for rec in parse_channel_records(html)]
 
     def fetch_stream_from_detail(self, url):
         """Visit channel detail page to extract the actual stream URL"""
-        html = self.fetch_page(url)
+        html = self.fetch_page(url, raw=True, skip_dead=True)
         if not html:
             return None
-        soup = BeautifulSoup(html, "html.parser")
-
-        # Look for M3U8 in scripts
-        scripts = soup.find_all("script")
-        for script in scripts:
-            text = script.string or ""
-            urls = re.findall(r'(https?://[^\s\'"]+\.m3u8[^\s\'"]*)', text)
-            if urls:
-                return urls[0]
-            # Also look for source/stream vars
-            matches = re.findall(r'(?:source|stream|url|src)["\s]*[:=]["\s]*(https?://[^\s\'"]+)', text)
-            for m in matches:
-                if any(x in m for x in [".m3u8", "/live", "/stream", ".ts"]):
-                    return m
-
-        # Look in video/source tags
-        for tag in soup.select("video source, source"):
-            src = tag.get("src", "")
-            if src and ("m3u8" in src or "stream" in src):
-                return src
+        stream_url, iframes = parse_detail_page(html)
+        if stream_url:
+            return stream_url
 
         # Look in iframes
-        for iframe in soup.select("iframe"):
-            src = iframe.get("src", "")
-            if src:
-                sub_html = self.fetch_page(src)
-                if sub_html:
-                    urls = re.findall(r'(https?://[^\s\'"]+\.m3u8[^\s\'"]*)', sub_html)
-                    if urls:
-                        return urls[0]
+        for src in iframes:
+            sub_html = self.fetch_page(src, raw=True, skip_dead=True)
+            if sub_html:
+                found = find_m3u8(sub_html)
+                if found:
+                    return found
 
         return None
 
     def find_logo(self, row, name):
-        """Try to find channel logo URL"""
-        img = row.find("img")
-        if img:
-            src = img.get("src") or img.get("data-src", "")
-            if src:
-                return urljoin(BASE_URL, src)
-        # Fallback: use a logo API
-        slug = re.sub(r'[^a-z0-9]', '-', name.lower()).strip('-')
-        return f"https://raw.githubusercontent.com/uddhavz/iptv-logos/main/logos/{slug}.png"
+        return find_logo(row, name)
 
     def categorize(self, name):
-        name_lower = name.lower()
-        for category, keywords in CATEGORY_KEYWORDS.items():
-            if category == "General":
-                continue
-            for kw in keywords:
-                if kw in name_lower:
-                    return category
-        return "General"
+        return categorize(name)
 
     def make_tvg_id(self, name):
-        return re.sub(r'[^a-zA-Z0-9]', '', name).lower()
-
-    def scrape(self, max_pages=5, only_online=True):
-        logger.info("Starting scrape of IPTVCat India...")
-        all_channels = []
+        return make_tvg_id(name)
+
+    def _resolve_stream(self, ch, delay=DETAIL_DELAY):
+        """Fill in a channel's stream URL from its detail page, timing the lookup"""
+        if ch["stream_url"] or not ch["detail_link"]:
+            return ch
+        logger.debug(f"  Fetching stream for: {ch['name']}")
+        started = time.monotonic()
+        ch["stream_url"] = self.fetch_stream_from_detail(ch["detail_link"])
+        ch["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+        if self.scheduler is not None:
+            self.scheduler.observe(ch["detail_link"], ch["stream_url"])
+        time.sleep(delay)  # Be polite
+        return ch
+
+    def _resolve_pooled(self, pending, parser_pool, delay=DETAIL_DELAY):
+        """
+        Resolve detail pages through the parser pool. Fetchers only download and
+        submit, so parses run on every parser process at once, while requests
+        to any one host still start at least delay seconds apart. Pages without
+        a stream follow their iframes in rounds (first iframe of each, then the
+        second, ...), stopping per channel at the first one that has a stream.
+        latency_ms is the network time of the lookup.
+        """
+        def timed_fetch(fetch_ms):
+            # Tasks are (index, url): two channels may share a link or an embed
+            def fetch(task):
+                index, url = task
+                self.pacer.wait(url, delay)  # Be polite
+                started = time.monotonic()
+                data = self.fetch_page(url, raw=True, skip_dead=True)
+                fetch_ms[index] = (time.monotonic() - started) * 1000
+                return data
+            return fetch
+
+        fetch_ms = {}
+        tasks = list(enumerate(ch["detail_link"] for ch in pending))
+        unresolved = []
+        parsed_pages = parser_pool.map(parse_detail_page, tasks, fetch=timed_fetch(fetch_ms))
+        for index, (ch, parsed) in enumerate(zip(pending, parsed_pages)):
+            stream_url, iframes = parsed or (None, [])
+            ch["stream_url"] = stream_url
+            ch["latency_ms"] = fetch_ms.get(index, 0.0)
+            if not stream_url and iframes:
+                unresolved.append((ch, iframes))
+
+        depth = 0
+        while unresolved:
+            fetch_ms = {}
+            tasks = list(enumerate(iframes[depth] for _, iframes in unresolved))
+            found_urls = parser_pool.map(find_m3u8, tasks, fetch=timed_fetch(fetch_ms))
+            still = []
+            for index, ((ch, iframes), found) in enumerate(zip(unresolved, found_urls)):
+                ch["latency_ms"] += fetch_ms.get(index, 0.0)
+                if found:
+                    ch["stream_url"] = found
+                elif depth + 1 < len(iframes):
+                    still.append((ch, iframes))
+            unresolved = still
+            depth += 1
+
+        for ch in pending:
+            ch["latency_ms"] = round(ch["latency_ms"], 1)
+            if self.scheduler is not None:
+                self.scheduler.observe(ch["detail_link"], ch["stream_url"])
+
+    def _apply_schedule(self, pending, pages_left):
+        """
+        Fill in cached stream URLs for detail links that are not due and return
+        the channels that still need their detail page fetched. The remaining
+        request budget is spread evenly over the pages still to come.
+        """
+        budget = None
+        if self.request_budget is not None:
+            remaining = max(self.request_budget - self.scheduler.fetched, 0)
+            budget = -(-remaining // max(pages_left, 1))
+        due = self.scheduler.plan([ch["detail_link"] for ch in pending], budget=budget)
+        for ch in pending:
+            if ch["detail_link"] not in due:
+                ch["stream_url"] = self.scheduler.reuse(ch["detail_link"])
+        if pending:
+            logger.info(f"  Recrawl: {len(due)} of {len(pending)} detail links due")
+        return [ch for ch in pending if ch["detail_link"] in due]
+
+    def _iter_pages(self, pages, total, parser_pool=None):
+        """Yield (page_index, channels) for each page, parsed inline or in the pool"""
+        if parser_pool is None:
+            for i, page_url in pages:
+                logger.info(f"Scraping page {i+1}/{total}: {page_url}")
+                html = self.fetch_page(page_url)
+                if html:
+                    yield i, self.parse_channels(html)
+                time.sleep(PAGE_DELAY)
+            return
+
+        urls = [url for _, url in pages]
+        for (i, page_url), records in zip(pages, parser_pool.map(parse_channel_records, urls)):
+            logger.info(f"Scraped page {i+1}/{total}: {page_url}")
+            if records is not None:
+                yield i, [dict(zip(RECORD_FIELDS, rec)) for rec in records]
+
+    def _iter_scraped(self, max_pages=5, shard=None):
+        """Yield every parsed channel, with its stream resolved, page by page"""
         pages = self.get_all_pages()
         pages = pages[:max_pages]
+        shard_index, shard_count, shard_by = shard or (0, 1, "pages")
+        if shard_count > 1:
+            logger.info(f"Shard {shard_index + 1}/{shard_count} (by {shard_by})")
+        total = len(pages)
+        pages = [(i, url) for i, url in enumerate(pages)
+                 if shard_by != "pages" or i % shard_count == shard_index]
+
+        parser_pool = None
+        if self.parse_workers > 0:
+            from parsepool import ParserPool
+            def fetch_listing(url):
+                self.pacer.wait(url, PAGE_DELAY)  # Be polite
+                return self.fetch_page(url, raw=True)
+
+            parser_pool = ParserPool(
+                fetch_listing,
+                workers=self.parse_workers,
+                fetch_workers=self.fetch_workers,
+            )
+
+        try:
+            for n, (i, channels) in enumerate(self._iter_pages(pages, total, parser_pool)):
+                for row, ch in enumerate(channels):
+                    ch["order"] = [i, row]
+                if shard_by == "links" and shard_count > 1:
+                    channels = [ch for ch in channels
+                                if shard_of(ch["detail_link"] or ch["stream_url"], shard_count) == shard_index]
+                logger.info(f"  Found {len(channels)} channels on this page")
+
+                # Fetch actual stream URLs from detail pages
+                pending = [ch for ch in channels if not ch["stream_url"] and ch["detail_link"]]
+                if self.negative_cache is not None:
+                    # Known-dead links cost no request budget, politeness delay or scheduler update
+                    pending = [ch for ch in pending if not self.negative_cache.is_dead(ch["detail_link"])]
+                if self.scheduler is not None:
+                    pending = self._apply_schedule(pending, pages_left=len(pages) - n)
+                if parser_pool is None:
+                    for ch in pending:
+                        self._resolve_stream(ch)
+                else:
+                    self._resolve_pooled(pending, parser_pool)
+
+                yield from channels
+        finally:
+            if parser_pool is not None:
+                parser_pool.close()
+            if self.scheduler is not None:
+                self.scheduler.save()
+            if self.negative_cache is not None:
+                self.negative_cache.save()
+            self.transport.log_stats()
+
+    def iter_channels(self, max_pages=5, only_online=True, shard=None):
+        """
+        Stream channels as pages are parsed, already filtered and deduplicated.
+        Memory is bounded by one page plus the set of seen stream URLs.
+        """
+        logger.info("Starting scrape of IPTVCat India...")
+        channels = self._iter_scraped(max_pages=max_pages, shard=shard)
+        return dedup_streams(filter_streamable(channels, only_online=only_online))
+
+    def scrape(self, max_pages=5, only_online=True, shard=None):
+        """
+        Scrape up to max_pages pages. With shard=(index, count, by), only this
+        worker's share is scraped: by="pages" takes every count-th page, by="links"
+        parses all pages but keeps only rows whose detail link hashes to index
+        (so every links shard pays for the full set of listing pages).
+        Each channel carries an "order" (page, row) so shards merge deterministically.
+        """
+        logger.info("Starting scrape of IPTVCat India...")
+        self.observed = []
 
-        for i, page_url in enumerate(pages):
-            logger.info(f"Scraping page {i+1}/{len(pages)}: {page_url}")
-            html = self.fetch_page(page_url)
-            if not html:
-                continue
-            channels = self.parse_channels(html)
-            logger.info(f"  Found {len(channels)} channels on this page")
-
-            # Fetch actual stream URLs from detail pages
+        def observe(channels):
             for ch in channels:
-                if not ch["stream_url"] and ch["detail_link"]:
-                    logger.debug(f"  Fetching stream for: {ch['name']}")
-                    ch["stream_url"] = self.fetch_stream_from_detail(ch["detail_link"])
-                    time.sleep(0.5)  # Be polite
-
-            all_channels.extend(channels)
-            time.sleep(1)
-
-        # Filter
-        if only_online:
-            before = len(all_channels)
-            all_channels = [c for c in all_channels if c["is_online"] and c["stream_url"]]
-            logger.info(f"Filtered to {len(all_channels)} online channels (from {before})")
-        else:
-            all_channels = [c for c in all_channels if c["stream_url"]]
-
-        # Deduplicate by stream URL
-        seen = set()
-        unique = []
-        for ch in all_channels:
-            if ch["stream_url"] not in seen:
-                seen.add(ch["stream_url"])
-                unique.append(ch)
-
-        logger.info(f"Final unique channels: {len(unique)}")
-        return unique
+                self.observed.append(ch)
+                yield ch
+
+        channels = observe(self._iter_scraped(max_pages=max_pages, shard=shard))
+        return list(dedup_streams(filter_streamable(channels, only_online=only_online)))
+
+
+# ─── Streaming Stages ─────────────────────────────────────────────────────────
+
+def filter_streamable(channels, only_online=True):
+    """Drop channels without a stream URL (and offline ones when only_online)"""
+    before = kept = 0
+    for ch in channels:
+        before += 1
+        if ch["stream_url"] and (ch["is_online"] or not only_online):
+            kept += 1
+            yield ch
+    if only_online:
+        logger.info(f"Filtered to {kept} online channels (from {before})")
+
+
+def dedup_streams(channels):
+    """Deduplicate by stream URL, keeping the first occurrence"""
+    seen = set()
+    for ch in channels:
+        if ch["stream_url"] not in seen:
+            seen.add(ch["stream_url"])
+            yield ch
+    logger.info(f"Final unique channels: {len(seen)}")
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Sharded Scraping
+Splits the crawl across independent worker processes (or CI matrix jobs)
+that each write a partial result file, then merges them deterministically
+
+Shards split by "pages" (the default) each fetch every count-th listing page.
+Shards split by "links" each fetch and parse every listing page and keep the
+rows whose detail link hashes to them, so listing traffic grows with the
+shard count; it only pays off when detail pages dominate the crawl.
+
+Usage:
+  python shard.py worker --index 0 --count 4 --pages 20 --out output/shards
+  python shard.py merge output/shards
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SHARD_MODES = ("pages", "links")
+
+
+def shard_of(key, count):
+    """Stable shard number for a key (same on every machine and Python run)"""
+    if count <= 1:
+        return 0
+    digest = hashlib.md5((key or "").encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def partial_path(out_dir, index):
+    return Path(out_dir) / f"shard_{index:03d}.json"
+
+
+def shard_state_paths(partial):
+    """Recrawl state and dead-link cache a worker writes next to its partial file"""
+    partial = Path(partial)
+    suffix = partial.name[len("shard_"):]
+    return partial.with_name(f"recrawl_state_{suffix}"), partial.with_name(f"dead_links_{suffix}")
+
+
+# ─── Worker ───────────────────────────────────────────────────────────────────
+
+def run_worker(index, count, by="pages", max_pages=5, only_online=True, out_dir="output/shards",
+               use_proxy=False, parse_workers=0, fetch_workers=4, http2=False, schedule=True,
+               request_budget=None, recheck_dead=False):
+    """
+    Scrape one shard and write its partial result file. The shared recrawl
+    state and dead-link cache are read but never written here: updates go to
+    per-shard files next to the partial, which merge_shards folds back in.
+    """
+    from scraper import IPTVCatScraper
+    from scheduler import RecrawlScheduler
+    from negcache import NegativeCache
+
+    path = partial_path(out_dir, index)
+    state_path, cache_path = shard_state_paths(path)
+    scraper = IPTVCatScraper(
+        use_proxy=use_proxy,
+        parse_workers=parse_workers,
+        fetch_workers=fetch_workers,
+        http2=http2,
+        scheduler=RecrawlScheduler(save_path=state_path) if schedule else None,
+        request_budget=request_budget,
+        negative_cache=NegativeCache(recheck=recheck_dead, save_path=cache_path),
+    )
+    with scraper:
+        channels = scraper.scrape(max_pages=max_pages, only_online=only_online, shard=(index, count, by))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "shard": index,
+            "count": count,
+            "by": by,
+            "channels": channels,
+            "observed": scraper.observed,
+        }, f, ensure_ascii=False)
+    os.replace(tmp, path)  # readers never see a half-written partial
+    logger.info(f"Shard {index + 1}/{count}: wrote {len(channels)} channels to {path}")
+    return str(path)
+
+
+# ─── Merge ────────────────────────────────────────────────────────────────────
+
+def load_partials(paths):
+    partials = []
+    for path in sorted(paths):
+        with open(path, encoding="utf-8") as f:
+            partials.append(json.load(f))
+    if partials:
+        counts = {p["count"] for p in partials}
+        if len(counts) != 1:
+            raise ValueError(f"Partials come from different shard counts: {sorted(counts)}")
+        missing = set(range(counts.pop())) - {p["shard"] for p in partials}
+        if missing:
+            logger.warning(f"Merging without shards: {sorted(missing)}")
+    return partials
+
+
+def merge_shards(paths, state_path=None, cache_path=None):
+    """
+    Combine partial results into (channels, observed). Channels are ordered by
+    their (page, row) position and deduplicated by stream URL, so the result
+    matches a single-process scrape regardless of shard count or finish order.
+    Per-shard recrawl state and dead-link files are merged into state_path and
+    cache_path (default: the scheduler's and cache's usual files) and removed.
+    """
+    partials = load_partials(paths)
+    merge_shard_state(paths, state_path, cache_path)
+
+    def by_order(ch):
+        return tuple(ch.get("order") or (0, 0))
+
+    channels = sorted((ch for p in partials for ch in p["channels"]), key=by_order)
+    observed = sorted((ch for p in partials for ch in p.get("observed", [])), key=by_order)
+
+    # Hand back the observed rows themselves, as a single-process scrape does
+    rows = {tuple(ch["order"]): ch for ch in observed if ch.get("order")}
+    seen = set()
+    unique = []
+    for ch in channels:
+        if ch["stream_url"] not in seen:
+            seen.add(ch["stream_url"])
+            unique.append(rows.get(tuple(ch.get("order") or ()), ch))
+
+    logger.info(f"Merged {len(partials)} shards: {len(unique)} unique channels (from {len(channels)})")
+    return unique, observed
+
+
+def merge_shard_state(paths, state_path=None, cache_path=None):
+    from scheduler import DEFAULT_STATE_PATH, merge_states
+    from negcache import DEFAULT_CACHE_PATH, merge_caches
+
+    states, caches = [], []
+    for path in paths:
+        state, cache = shard_state_paths(path)
+        if state.exists():
+            states.append(state)
+        if cache.exists():
+            caches.append(cache)
+    if states:
+        merge_states(states, state_path or DEFAULT_STATE_PATH)
+    if caches:
+        merge_caches(caches, cache_path or DEFAULT_CACHE_PATH)
+    # Merging the same shard files twice would undo other shards' updates
+    for path in states + caches:
+        os.remove(path)
+
+
+def shard_files(out_dir):
+    return glob.glob(str(Path(out_dir) / "shard_*.json"))
+
+
+# ─── Local Runner ─────────────────────────────────────────────────────────────
+
+def run_local(count, by="pages", max_pages=5, only_online=True, out_dir="output/shards",
+              use_proxy=False, parse_workers=0, fetch_workers=4, http2=False, schedule=True,
+              request_budget=None, recheck_dead=False):
+    """
+    Run count worker processes in parallel on this machine and merge their
+    output. request_budget is split evenly across the shards.
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    for stale in shard_files(out):
+        os.remove(stale)
+        for state in shard_state_paths(stale):
+            if state.exists():
+                os.remove(state)
+
+    procs = []
+    for index in range(count):
+        cmd = [sys.executable, os.path.abspath(__file__), "worker",
+               "--index", str(index), "--count", str(count), "--by", by,
+               "--pages", str(max_pages), "--out", str(out)]
+        if not only_online:
+            cmd.append("--all")
+        if use_proxy:
+            cmd.append("--proxy")
+        if parse_workers:
+            cmd += ["--parse-workers", str(parse_workers), "--fetch-workers", str(fetch_workers)]
+        if http2:
+            cmd.append("--http2")
+        if not schedule:
+            cmd.append("--no-schedule")
+        if request_budget is not None:
+            cmd += ["--request-budget", str(-(-request_budget // count))]
+        if recheck_dead:
+            cmd.append("--recheck-dead")
+        procs.append(subprocess.Popen(cmd))
+
+    failed = [i for i, p in enumerate(procs) if p.wait() != 0]
+    if failed:
+        logger.warning(f"Shard workers failed: {failed}")
+    return merge_shards(shard_files(out))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Sharded IPTVCat scraping")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    worker = sub.add_parser("worker", help="Scrape one shard")
+    worker.add_argument("--index", type=int, required=True, help="Shard index (0-based)")
+    worker.add_argument("--count", type=int, required=True, help="Total number of shards")
+    worker.add_argument("--by", choices=SHARD_MODES, default="pages", help="Partition by page, or by detail-link hash (every shard fetches every listing page)")
+    worker.add_argument("--pages", type=int, default=5, help="Max pages to scrape (default: 5)")
+    worker.add_argument("--all", action="store_true", help="Include offline channels")
+    worker.add_argument("--proxy", action="store_true", help="Use proxy for geo-blocked channels")
+    worker.add_argument("--parse-workers", type=int, default=0, help="Parse HTML in N worker processes (default: 0 = inline)")
+    worker.add_argument("--fetch-workers", type=int, default=4, help="Concurrent page downloads with --parse-workers (default: 4)")
+    worker.add_argument("--http2", action="store_true", help="Use HTTP/2 multiplexing (needs httpx[http2])")
+    worker.add_argument("--no-schedule", action="store_true", help="Revisit every detail page instead of only the due ones")
+    worker.add_argument("--request-budget", type=int, help="Max detail pages this shard fetches (default: all due)")
+    worker.add_argument("--recheck-dead", action="store_true", help="Retry every URL in the dead-link cache this run")
+    worker.add_argument("--out", default="output/shards", help="Directory for partial result files")
+
+    merge = sub.add_parser("merge", help="Merge partial result files")
+    merge.add_argument("dir", nargs="?", default="output/shards", help="Directory with shard_*.json files")
+    merge.add_argument("--out", default="-", help="Write merged channel list here (default: stdout)")
+
+    args = parser.parse_args()
+    if args.command == "worker":
+        if not 0 <= args.index < args.count:
+            parser.error("--index must be in [0, --count)")
+        run_worker(args.index, args.count, by=args.by, max_pages=args.pages,
+                   only_online=not args.all, out_dir=args.out, use_proxy=args.proxy,
+                   parse_workers=args.parse_workers, fetch_workers=args.fetch_workers, http2=args.http2,
+                   schedule=not args.no_schedule, request_budget=args.request_budget,
+                   recheck_dead=args.recheck_dead)
+    else:
+        channels, _ = merge_shards(shard_files(args.dir))
+        text = json.dumps(channels, ensure_ascii=False)
+        if args.out == "-":
+            print(text)
+        else:
+            Path(args.out).write_text(text, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The project is a set of top-level modules, not a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+@pytest.fixture(scope="module")
+def iptvcat():
+    """Stand-in IPTVCat server; scrapers started in subprocesses are pointed at it"""
+    from iptvcat_server import IPTVCatServer
+    server = IPTVCatServer().start()
+    with pytest.MonkeyPatch.context() as mp:
+        # Read at import time by the scraper in every worker process
+        mp.setenv("IPTVCAT_BASE_URL", server.base_url)
+        yield server
+    server.close()
@@ -0,0 +1,68 @@
+"""
+Tiny asyncio HLS origin for monitor tests. Streams are added by path and
+their media sequence / status is changed by the test between polls.
+"""
+
+import asyncio
+
+
+class FakeStream:
+    def __init__(self, sequence=0, status=200, segment_status=200, ended=False):
+        self.sequence = sequence
+        self.status = status
+        self.segment_status = segment_status
+        self.ended = ended
+
+    def playlist(self):
+        segments = "".join(f"#EXTINF:2.0,\nseg{self.sequence + i}.ts\n" for i in range(3))
+        return (f"#EXTM3U\n#EXT-X-TARGETDURATION:2\n#EXT-X-MEDIA-SEQUENCE:{self.sequence}\n"
+                f"{segments}{'#EXT-X-ENDLIST' if self.ended else ''}")
+
+
+class FakeOrigin:
+    def __init__(self):
+        self.streams = {}      # "/name" -> FakeStream
+        self.masters = {}      # "/name/master.m3u8" -> variant path
+        self.requests = []
+        self.server = None
+        self.port = None
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def add(self, name, **kwargs):
+        self.streams[f"/{name}"] = stream = FakeStream(**kwargs)
+        return stream
+
+    def add_master(self, name, variant):
+        self.masters[f"/{name}/master.m3u8"] = f"/{variant}/index.m3u8"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _route(self, path):
+        if path in self.masters:
+            return 200, f"#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=500000,RESOLUTION=640x360\n{self.masters[path]}\n"
+        stream_path, _, name = path.rpartition("/")
+        stream = self.streams.get(stream_path)
+        if stream is None:
+            return 404, ""
+        if name.endswith(".ts"):
+            return stream.segment_status, "x"
+        return stream.status, stream.playlist() if stream.status < 400 else ""
+
+    async def _handle(self, reader, writer):
+        head = await reader.readuntil(b"\r\n\r\n")
+        path = head.split(b" ", 2)[1].decode()
+        self.requests.append(path)
+        status, body = self._route(path)
+        data = body.encode()
+        writer.write(f"HTTP/1.0 {status} X\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+        await writer.drain()
+        writer.close()
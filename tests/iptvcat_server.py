@@ -0,0 +1,67 @@
+"""
+Stand-in IPTVCat server for scraper and shard tests. Serves the HTML in
+tests/fixtures/iptvcat (listing pages at /india and /india/N, detail pages
+at /channel/<slug>, iframe embeds at /embed/<slug>); anything else is a 404.
+"{base}" in a fixture is replaced with the server's own URL.
+"""
+
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from conftest import FIXTURES
+
+ROUTES = [
+    (re.compile(r"^/india$"), lambda m: "india.html"),
+    (re.compile(r"^/india/(\d+)$"), lambda m: f"india_{m.group(1)}.html"),
+    (re.compile(r"^/(channel|embed)/([\w-]+)$"), lambda m: f"{m.group(1)}/{m.group(2)}.html"),
+]
+
+
+class IPTVCatServer:
+    def __init__(self, root=FIXTURES / "iptvcat"):
+        self.root = root
+        self.requests = []     # (monotonic time, path)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def page(self, path):
+        for pattern, name in ROUTES:
+            match = pattern.match(path)
+            if match:
+                file = self.root / name(match)
+                if file.exists():
+                    return file.read_text(encoding="utf-8").replace("{base}", self.base_url)
+        return None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests.append((time.monotonic(), self.path))
+                body = server.page(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
@@ -0,0 +1,33 @@
+import json
+
+from generator import PlaylistGenerator, decode_columnar, encode_columnar
+
+
+def channels():
+    return [
+        {"name": "Star Plus", "stream_url": "https://cdn.example.com/star/index.m3u8?t=1",
+         "detail_link": "https://iptvcat.com/channel/star-plus", "category": "Entertainment",
+         "logo": "https://logos.example.com/india/star-plus.png", "is_online": True},
+        {"name": "Aaj Tak", "stream_url": "https://cdn.example.com/aajtak/",
+         "detail_link": "https://iptvcat.com/channel/aaj-tak", "category": "News",
+         "logo": None, "is_online": False},
+        {"name": "DD", "stream_url": "rtmp-less-url", "detail_link": None,
+         "category": "News", "logo": "", "is_online": True},
+    ]
+
+
+def test_columnar_round_trips_to_the_readable_index(tmp_path):
+    index = PlaylistGenerator(output_dir=tmp_path).build_index(channels())
+    readable = [dict(ch, category=cat) for cat, entry in index["categories"].items() for ch in entry["channels"]]
+    assert decode_columnar(encode_columnar(index)) == readable
+
+
+def test_compact_artifacts_share_the_index(tmp_path):
+    gen = PlaylistGenerator(output_dir=tmp_path)
+    index = gen.build_index(channels())
+    gen.generate_json_index(channels(), index=index)
+    gen.generate_compact_artifacts(channels(), index=index)
+
+    generated_at = json.loads((tmp_path / "channels.json").read_text())["generated_at"]
+    for name in ("channels.min.json", "channels.columnar.json"):
+        assert json.loads((tmp_path / name).read_text())["generated_at"] == generated_at
@@ -0,0 +1,66 @@
+import json
+
+from delta import apply_delta, assign_identities, channel_identity
+from generator import PlaylistGenerator, load_json_index
+from history import ChannelHistory, stream_key
+
+
+def scraped_channels():
+    return [
+        {"name": "Star Plus", "stream_url": "https://cdn.example.com/a/index.m3u8?token=1",
+         "detail_link": "https://iptvcat.com/channel/star-plus-1", "category": "Entertainment",
+         "logo": "", "is_online": True},
+        {"name": "Aaj Tak", "stream_url": "https://cdn.example.com/b/index.m3u8?token=1",
+         "detail_link": "https://iptvcat.com/channel/aaj-tak-1", "category": "News",
+         "logo": "", "is_online": True},
+    ]
+
+
+def test_reloaded_index_keeps_delta_identity(tmp_path):
+    gen = PlaylistGenerator(output_dir=tmp_path)
+    channels = scraped_channels()
+    gen.generate_json_index(channels)
+    first = gen.generate_delta(channels)
+
+    reloaded = load_json_index(tmp_path / "channels.json")
+    assert sorted(map(channel_identity, reloaded)) == sorted(map(channel_identity, channels))
+    assert first["sequence"] == 1
+    assert gen.generate_delta(reloaded) is None  # nothing changed, nothing published
+
+
+def test_delta_applies_on_top_of_state(tmp_path):
+    gen = PlaylistGenerator(output_dir=tmp_path)
+    channels = scraped_channels()
+    gen.generate_delta(channels[:1])
+    state = json.loads((tmp_path / "delta" / "state.json").read_text())
+    gen.generate_delta(channels)
+    delta = json.loads((tmp_path / "delta" / "delta_000002.json").read_text())
+    assert apply_delta(state, delta)["channels"].keys() == {channel_identity(ch) for ch in channels}
+
+
+def mirrors():
+    """Two rows that differ only in the stream URL's query, with no detail link"""
+    return [
+        {"name": "DD News", "stream_url": f"https://cdn.example.com/dd/index.m3u8?mirror={i}",
+         "detail_link": None, "category": "News", "logo": "", "is_online": True}
+        for i in (1, 2)
+    ]
+
+
+def test_colliding_rows_keep_separate_identities(tmp_path):
+    channels = mirrors()
+    assert channel_identity(channels[0]) == channel_identity(channels[1])
+
+    gen = PlaylistGenerator(output_dir=tmp_path)
+    gen.generate_json_index(channels)
+    gen.generate_delta(channels)
+    state = json.loads((tmp_path / "delta" / "state.json").read_text())
+    assert sorted(entry["url"] for entry in state["channels"].values()) == [ch["stream_url"] for ch in channels]
+
+    # channels.json and the history store use the same two ids
+    ids = {ch["identity"] for ch in load_json_index(tmp_path / "channels.json")}
+    assert ids == set(state["channels"])
+    with ChannelHistory(tmp_path / "history.db") as history:
+        history.record_run(mirrors())
+        assert set(history.stream_stats(ids)) == ids
+    assert {stream_key(ch) for ch in assign_identities(mirrors())} == ids
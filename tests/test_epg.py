@@ -0,0 +1,64 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from epg import EPGIndex, parse_xmltv_time
+from xmltv_fixture import write_guide
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+def test_parse_xmltv_time_offsets():
+    assert parse_xmltv_time("20240101120000 +0530") == parse_xmltv_time("20240101063000 +0000")
+    assert parse_xmltv_time("20240101120000 +0a30") is None
+    assert parse_xmltv_time("20240101120000 +2500") is None
+
+
+def test_malformed_offset_skips_only_that_programme(tmp_path):
+    guide = tmp_path / "guide.xml"
+    guide.write_text(
+        '<tv>'
+        '<programme channel="a.in" start="20240101120000 +0a30" stop="20240101130000 +0000">'
+        '<title>Bad</title></programme>'
+        '<programme channel="a.in" start="20240101130000 +0000" stop="20240101140000 +0000">'
+        '<title>Good</title></programme>'
+        '</tv>', encoding="utf-8")
+    with EPGIndex(tmp_path / "epg.db") as index:
+        assert index.build([str(guide)]) == 1
+        at = parse_xmltv_time("20240101133000 +0000")
+        assert index.now_next(["a.in"], at=at)["a.in"]["now"]["title"] == "Good"
+
+
+def peak_rss_mb(guide, db):
+    """Peak RSS (MB) of a fresh interpreter that indexes guide"""
+    code = ("import resource, sys; from epg import EPGIndex; "
+            "EPGIndex(sys.argv[2]).build([sys.argv[1]]); "
+            "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)")
+    out = subprocess.run([sys.executable, "-c", code, str(guide), str(db)],
+                         cwd=REPO, capture_output=True, text=True, check=True)
+    return int(out.stdout) / 1024
+
+
+def test_build_memory_does_not_grow_with_guide_size(tmp_path):
+    small = write_guide(tmp_path / "small.xml.gz", 2_000)
+    large = write_guide(tmp_path / "large.xml.gz", 50_000)
+    baseline = peak_rss_mb(small, tmp_path / "small.db")
+    peak = peak_rss_mb(large, tmp_path / "large.db")
+    # Keeping the parsed elements costs about 1 KB per programme (~50 MB here)
+    assert peak - baseline < 20, f"peak RSS {peak:.0f} MB vs {baseline:.0f} MB baseline"
+
+
+def test_failed_rebuild_keeps_previous_index(tmp_path):
+    guide = write_guide(tmp_path / "guide.xml", 20, channels=2)
+    broken = tmp_path / "broken.xml"
+    broken.write_text("<tv><programme channel=", encoding="utf-8")
+    at = parse_xmltv_time("20240101001000 +0000")
+    with EPGIndex(tmp_path / "epg.db") as index:
+        assert index.build([str(guide)]) == 20
+        assert index.build([str(tmp_path / "missing.xml"), str(broken)]) == 0
+        assert index.now_next(["ch0.in"], at=at)["ch0.in"]["now"]["title"] == "Show 0"
+
+        # One good source is enough to replace the guide
+        write_guide(guide, 4, channels=1)
+        assert index.build([str(broken), str(guide)]) == 4
+        assert index.now_next(["ch1.in"], at=at)["ch1.in"]["now"] is None
@@ -0,0 +1,46 @@
+from generator import PlaylistGenerator
+from history import ChannelHistory, stream_key
+
+
+def channel(token, **extra):
+    return dict({
+        "name": "News 24",
+        "stream_url": f"http://cdn.example.com/news24/index.m3u8?token={token}",
+        "detail_link": "https://iptvcat.example/channel/news-24",
+        "category": "News",
+        "is_online": True,
+        "latency_ms": 100.0,
+    }, **extra)
+
+
+def test_rotating_tokens_build_one_history(tmp_path):
+    with ChannelHistory(tmp_path / "history.db") as history:
+        history.record_run([channel("a")])
+        history.record_run([channel("b", is_online=False)])
+        stats = history.stream_stats([stream_key(channel("c"))])
+    [entry] = stats.values()
+    assert entry["samples"] == 2
+    assert entry["uptime"] == 0.5
+
+
+def test_key_ignores_query_without_detail_link():
+    a = channel("a", detail_link=None)
+    b = channel("b", detail_link=None)
+    assert stream_key(a) == stream_key(b)
+    assert stream_key(a) != stream_key(dict(a, stream_url="http://cdn.example.com/other/index.m3u8"))
+
+
+def test_quality_playlists_keep_the_history_key(tmp_path):
+    ch = channel("a", variants=[
+        {"url": "http://cdn.example.com/news24/720.m3u8", "bandwidth": 2_500_000,
+         "resolution": "1280x720", "width": 1280, "height": 720, "codecs": None},
+    ])
+    gen = PlaylistGenerator(output_dir=str(tmp_path))
+    captured = []
+    gen.generate_m3u = lambda picked, filename: captured.extend(picked) or tmp_path / filename
+    gen.generate_quality_playlists([ch], qualities=("hd",))
+    assert stream_key(captured[0]) == stream_key(ch)
+    # Same key without a detail link: the variant URL must not leak into it
+    captured.clear()
+    gen.generate_quality_playlists([dict(ch, detail_link=None)], qualities=("hd",))
+    assert stream_key(captured[0]) == stream_key(dict(ch, detail_link=None))
@@ -0,0 +1,53 @@
+from urllib.parse import urlparse
+
+from conftest import FIXTURES
+from hls import HLSAnalyzer, parse_master_playlist, parse_media_playlist, pick_variant
+
+BASE = "https://cdn.example.com/live/master.m3u8"
+
+
+def fixture_fetch(url):
+    """Serve https://cdn.example.com/live/<name> from tests/fixtures/hls/<name>"""
+    return (FIXTURES / "hls" / urlparse(url).path.rsplit("/", 1)[-1]).read_text(encoding="utf-8")
+
+
+def test_master_variants_sorted_and_resolved():
+    variants = parse_master_playlist((FIXTURES / "hls" / "master.m3u8").read_text(), base_url=BASE)
+    assert [v["bandwidth"] for v in variants] == [800000, 2560000, 5000000, 9000000]
+    assert variants[0]["url"] == "https://cdn.example.com/live/360p/index.m3u8"
+    assert variants[0]["height"] == 360
+    assert variants[0]["codecs"] == "avc1.4d401e,mp4a.40.2"
+
+
+def test_pick_variant_quality_bands():
+    variants = parse_master_playlist((FIXTURES / "hls" / "master.m3u8").read_text(), base_url=BASE)
+    assert pick_variant(variants, "sd")["height"] == 360
+    # 2160p is above the HD band, so the best HD pick is 1080p
+    assert pick_variant(variants, "hd")["height"] == 1080
+
+
+def test_pick_variant_by_bandwidth_without_resolution():
+    variants = parse_master_playlist((FIXTURES / "hls" / "no_resolution.m3u8").read_text(), base_url=BASE)
+    assert pick_variant(variants, "sd")["url"].endswith("/low.m3u8")
+    assert pick_variant(variants, "hd")["url"].endswith("/high.m3u8")
+
+
+def test_media_playlist_summary():
+    info = parse_media_playlist((FIXTURES / "hls" / "media.m3u8").read_text())
+    assert info == {"media_sequence": 1042, "segments": 3, "target_duration": 6.0,
+                    "last_segment": "seg1044.ts", "ended": False}
+    assert parse_master_playlist((FIXTURES / "hls" / "media.m3u8").read_text()) == []
+
+
+def test_analyzer_with_fixture_fetch():
+    analyzer = HLSAnalyzer(fetch=fixture_fetch)
+    channels = analyzer.analyze_channels([{"stream_url": BASE}])
+    assert len(channels[0]["variants"]) == 4
+
+
+def test_analyzer_never_reads_local_paths(tmp_path):
+    playlist = tmp_path / "x.m3u8"
+    playlist.write_text((FIXTURES / "hls" / "master.m3u8").read_text())
+    analyzer = HLSAnalyzer()
+    for url in (str(playlist), f"file://{playlist}"):
+        assert analyzer.analyze_url(url) == []
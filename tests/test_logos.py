@@ -0,0 +1,78 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import logos
+from logos import PLACEHOLDER_NAME, LogoStore, default_base_url
+
+BASE = "https://cdn.example.com/logos/"
+
+
+def test_base_url_from_github_actions(monkeypatch):
+    monkeypatch.setattr(logos, "LOGO_BASE_URL", "")
+    monkeypatch.setenv("GITHUB_REPOSITORY", "owner/india-iptv")
+    monkeypatch.setenv("GITHUB_REF_NAME", "main")
+    assert default_base_url() == "https://raw.githubusercontent.com/owner/india-iptv/main/output/logos/"
+
+
+def test_store_refuses_relative_logo_urls(monkeypatch, tmp_path):
+    monkeypatch.setattr(logos, "LOGO_BASE_URL", "")
+    monkeypatch.delenv("GITHUB_REPOSITORY", raising=False)
+    assert default_base_url() == ""
+    with pytest.raises(ValueError):
+        LogoStore(tmp_path / "logos")
+
+
+def test_cached_logos_are_absolute(tmp_path):
+    store = LogoStore(tmp_path / "logos", base_url="https://cdn.example.com/logos")
+    assert store.placeholder_url() == "https://cdn.example.com/logos/placeholder.png"
+
+
+@pytest.fixture
+def image_server():
+    """Serves /<name>.png with a body of /<size> bytes; Content-Length is omitted for "nolength" paths"""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.end_headers()
+
+        def do_GET(self):
+            name = self.path.rsplit("/", 1)[-1]
+            size = int(name.split("-")[1].split(".")[0])
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            if "nolength" not in name:
+                self.send_header("Content-Length", str(size))
+            self.end_headers()
+            self.wfile.write(name.encode()[:1] * size)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_oversized_logos_are_not_stored(image_server, tmp_path):
+    store = LogoStore(tmp_path / "logos", base_url=BASE, max_bytes=1000)
+    assert store.fetch(f"{image_server}/a-500.png")["file"]
+    assert store.fetch(f"{image_server}/b-5000.png")["file"] is None
+    assert store.fetch(f"{image_server}/nolength-5000.png")["file"] is None
+
+
+def test_unused_logos_are_pruned(image_server, tmp_path):
+    store = LogoStore(tmp_path / "logos", base_url=BASE)
+    urls = [f"{image_server}/{c}-{100 + i}.png" for i, c in enumerate("abc")]
+    store.process_channels([{"name": c, "logo": url} for c, url in zip("abc", urls)])
+    assert len(list(store.logo_dir.glob("*.png"))) == 4  # three logos + placeholder
+
+    store = LogoStore(tmp_path / "logos", base_url=BASE)
+    channels = store.process_channels([{"name": "a", "logo": urls[0]}])
+    kept = {p.name for p in store.logo_dir.iterdir()}
+    assert kept == {channels[0]["logo"][len(BASE):], PLACEHOLDER_NAME, "index.json"}
+    assert list(store.index) == [urls[0]]
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from fake_hls_origin import FakeOrigin
+from monitor import LIVE_PLAYLIST, STATUS_FILE, StreamMonitor, StreamState
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def started_origin():
+    return await FakeOrigin().start()
+
+
+def write_index(path, origin, names):
+    channels = [{"name": name.title(), "url": origin.url(f"/{name}/index.m3u8"), "logo": "",
+                 "tvg_id": "", "is_online": True} for name in names]
+    path.write_text(json.dumps({"categories": {"General": {"count": len(channels), "channels": channels}}}))
+
+
+async def poll(monitor, origin, name, stall=False):
+    url = origin.url(f"/{name}/index.m3u8")
+    state = monitor.streams.setdefault(url, StreamState({"name": name, "stream_url": url}))
+    if stall and state.progress_at is not None:
+        state.progress_at -= 3600  # pretend the last progress was long ago
+    await monitor.check(url, state)
+    return state
+
+
+def test_sequence_reset_counts_as_progress(tmp_path):
+    async def scenario():
+        origin = await started_origin()
+        stream = origin.add("enc", sequence=1000)
+        monitor = StreamMonitor(tmp_path / "channels.json", tmp_path)
+        await poll(monitor, origin, "enc")
+        for sequence in (5, 6, 7, 8):
+            stream.sequence = sequence
+            state = await poll(monitor, origin, "enc", stall=True)
+            assert state.online and state.reason is None
+        await origin.close()
+    run(scenario())
+
+
+def test_stall_segment_error_and_dead_stream(tmp_path):
+    async def scenario():
+        origin = await started_origin()
+        origin.add("frozen", sequence=42)
+        origin.add("badseg", segment_status=404)
+        origin.add("vod", ended=True)
+        monitor = StreamMonitor(tmp_path / "channels.json", tmp_path)
+
+        await poll(monitor, origin, "frozen")
+        state = await poll(monitor, origin, "frozen", stall=True)
+        assert not state.online and state.reason == "stalled"
+
+        state = await poll(monitor, origin, "badseg")
+        assert state.online  # one failed poll is tolerated
+        origin.streams["/badseg"].sequence += 1
+        state = await poll(monitor, origin, "badseg")
+        assert not state.online and state.reason == "segment HTTP 404"
+
+        for _ in range(2):
+            state = await poll(monitor, origin, "missing")
+        assert not state.online and state.reason == "HTTP 404"
+
+        state = await poll(monitor, origin, "vod", stall=True)
+        assert state.online
+        await origin.close()
+    run(scenario())
+
+
+def test_master_playlist_resolves_to_variant(tmp_path):
+    async def scenario():
+        origin = await started_origin()
+        origin.add("low")
+        origin.add_master("chan", "low")
+        monitor = StreamMonitor(tmp_path / "channels.json", tmp_path)
+        url = origin.url("/chan/master.m3u8")
+        state = StreamState({"name": "Chan", "stream_url": url})
+        await monitor.check(url, state)
+        assert state.online and state.media_url == origin.url("/low/index.m3u8")
+        await origin.close()
+    run(scenario())
+
+
+def test_run_rewrites_live_playlist(tmp_path):
+    async def scenario():
+        origin = await started_origin()
+        origin.add("live")
+        origin.add("gone", status=503)
+        write_index(tmp_path / "channels.json", origin, ["live", "gone"])
+        monitor = StreamMonitor(tmp_path / "channels.json", tmp_path, interval=0.2, flush_interval=0.1)
+        await monitor.run(duration=1.5)
+        await origin.close()
+    run(scenario())
+
+    playlist = (tmp_path / LIVE_PLAYLIST).read_text()
+    assert "/live/index.m3u8" in playlist and "/gone/" not in playlist
+    status = json.loads((tmp_path / STATUS_FILE).read_text())
+    assert (status["online"], status["offline"]) == (1, 1)
+
+
+def test_half_written_index_is_retried(tmp_path):
+    index = tmp_path / "channels.json"
+    index.write_text('{"categories": {"General": {"count": 1, "chan')
+    mtime = index.stat().st_mtime_ns
+    monitor = StreamMonitor(index, tmp_path)
+    with pytest.raises(ValueError):
+        monitor.reload_index(0)
+    # The writer finishes within the same mtime tick
+    index.write_text(json.dumps({"categories": {"General": {"count": 1, "channels": [
+        {"name": "A", "url": "http://127.0.0.1:9/a.m3u8"}]}}}))
+    os.utime(index, ns=(mtime, mtime))
+    assert monitor.reload_index(0)
+    assert len(monitor.streams) == 1
+
+
+def test_malformed_urls_do_not_stall_the_monitor(tmp_path):
+    bad = ["http://host:abc/x.m3u8", "http://" + "a" * 64 + ".example/x.m3u8"]
+
+    async def scenario():
+        origin = await started_origin()
+        origin.add("live")
+        channels = [{"name": f"Bad {i}", "url": url, "is_online": True} for i, url in enumerate(bad)]
+        channels.append({"name": "Live", "url": origin.url("/live/index.m3u8"), "is_online": True})
+        (tmp_path / "channels.json").write_text(json.dumps(
+            {"categories": {"General": {"count": len(channels), "channels": channels}}}))
+        monitor = StreamMonitor(tmp_path / "channels.json", tmp_path, interval=0.2,
+                                concurrency=2, flush_interval=0.1)
+        await monitor.run(duration=1.5)
+        await origin.close()
+        return monitor, origin
+
+    monitor, origin = run(scenario())
+    assert origin.requests.count("/live/index.m3u8") > 1
+    for url in bad:
+        state = monitor.streams[url]
+        assert not state.online and state.errors > 1
+
+
+def test_worker_survives_unexpected_errors(tmp_path):
+    async def scenario():
+        origin = await started_origin()
+        origin.add("live")
+        write_index(tmp_path / "channels.json", origin, ["boom", "live"])
+        monitor = StreamMonitor(tmp_path / "channels.json", tmp_path, interval=0.2,
+                                concurrency=1, flush_interval=0.1)
+        real_poll = monitor._poll
+
+        async def flaky_poll(url, state, now):
+            if "/boom/" in url:
+                raise RuntimeError("parser bug")
+            return await real_poll(url, state, now)
+
+        monitor._poll = flaky_poll
+        await monitor.run(duration=1.5)
+        await origin.close()
+        return monitor, origin
+
+    monitor, origin = run(scenario())
+    assert origin.requests.count("/live/index.m3u8") > 1
+    boom = next(s for url, s in monitor.streams.items() if "/boom/" in url)
+    assert not boom.online and boom.reason == "RuntimeError: parser bug"
@@ -0,0 +1,42 @@
+from negcache import BASE_TTL, NegativeCache
+
+
+def folded_cache(tmp_path, count=50):
+    cache = NegativeCache(tmp_path / "dead.json", max_entries=10)
+    for i in range(count):
+        cache.record_failure(f"http://x.example/{i}")
+    cache.save()
+    return NegativeCache(tmp_path / "dead.json", max_entries=10)
+
+
+def test_folded_urls_stay_dead(tmp_path):
+    cache = folded_cache(tmp_path)
+    assert cache.blooms
+    assert all(cache.is_dead(f"http://x.example/{i}") for i in range(50))
+
+
+def test_recovered_folded_url_is_cleared(tmp_path):
+    cache = folded_cache(tmp_path)
+    folded = next(f"http://x.example/{i}" for i in range(50) if f"http://x.example/{i}" not in cache.urls)
+    cache.record_success(folded)
+    cache.save()
+
+    reloaded = NegativeCache(tmp_path / "dead.json", max_entries=10)
+    assert not reloaded.is_dead(folded)
+
+
+def test_refailing_folded_url_keeps_backing_off(tmp_path):
+    cache = folded_cache(tmp_path)
+    folded = next(f"http://x.example/{i}" for i in range(50) if f"http://x.example/{i}" not in cache.urls)
+    now = max(e["last"] for e in cache.urls.values())
+    cache.record_failure(folded, now=now)
+    assert cache.urls[folded]["failures"] == 2
+    assert cache.urls[folded]["expires"] == now + 2 * BASE_TTL
+
+
+def test_recheck_skips_nothing(tmp_path):
+    cache = NegativeCache(tmp_path / "dead.json")
+    cache.record_failure("http://x.example/a")
+    cache.save()
+    assert NegativeCache(tmp_path / "dead.json").is_dead("http://x.example/a")
+    assert not NegativeCache(tmp_path / "dead.json", recheck=True).is_dead("http://x.example/a")
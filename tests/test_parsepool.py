@@ -0,0 +1,53 @@
+import threading
+import time
+
+from parsepool import ParserPool
+
+
+def timed_parse(data):
+    """Sleep like a slow parse and report when it ran"""
+    started = time.monotonic()
+    time.sleep(0.2)
+    return data.upper(), started, time.monotonic()
+
+
+def max_overlap(intervals):
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    running = peak = 0
+    for _, step in events:
+        running += step
+        peak = max(peak, running)
+    return peak
+
+
+def test_parses_run_on_every_worker_in_input_order():
+    urls = [f"page-{i}" for i in range(16)]
+    with ParserPool(lambda url: url.encode(), workers=4, fetch_workers=2) as pool:
+        results = list(pool.map(timed_parse, urls))
+    assert [r[0] for r in results] == [url.upper().encode() for url in urls]
+    # Two fetchers hand off and move on, so more than two parses overlap
+    peak = max_overlap([(start, end) for _, start, end in results])
+    assert 2 < peak <= 4
+
+
+def test_fetch_failures_yield_none():
+    with ParserPool(lambda url: None if url == "dead" else url.encode(), workers=2) as pool:
+        assert [r and r[0] for r in pool.map(timed_parse, ["a", "dead", "b"])] == [b"A", None, b"B"]
+
+
+def test_submission_window_is_bounded():
+    fetched = []
+    lock = threading.Lock()
+
+    def fetch(url):
+        with lock:
+            fetched.append(url)
+        return url.encode()
+
+    with ParserPool(fetch, workers=1, fetch_workers=2, max_pending=2) as pool:
+        results = pool.map(timed_parse, (f"page-{i}" for i in range(12)))
+        next(results)
+        time.sleep(0.5)
+        # fetch_workers + max_pending items in flight, not all 12
+        assert len(fetched) <= 4 + 1
+        assert len(list(results)) == 11
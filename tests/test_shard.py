@@ -0,0 +1,94 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from negcache import NegativeCache
+from scheduler import RecrawlScheduler
+from shard import merge_shards, partial_path, run_local, shard_state_paths
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+def write_partial(out_dir, index, count, channels):
+    path = partial_path(out_dir, index)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"shard": index, "count": count, "by": "pages",
+                                "channels": channels, "observed": channels}))
+    return path
+
+
+def test_merge_folds_per_shard_state(tmp_path):
+    state_path = tmp_path / "recrawl_state.json"
+    cache_path = tmp_path / "dead_links.json"
+    now = time.time()
+    base = RecrawlScheduler(state_path)
+    base.observe("https://a/1", "http://s/1", now=now - 100)
+    base.observe("https://b/1", "http://s/2", now=now - 100)
+    base.save()
+    shared = NegativeCache(cache_path)
+    shared.record_failure("https://a/dead", now=now - 100)
+    shared.record_failure("https://b/dead", now=now - 100)
+    shared.save()
+
+    out = tmp_path / "shards"
+    paths = [write_partial(out, i, 2, []) for i in range(2)]
+    for index, link in ((0, "https://a/1"), (1, "https://b/1")):
+        state, cache = shard_state_paths(paths[index])
+        scheduler = RecrawlScheduler(state_path, save_path=state)
+        scheduler.observe(link, f"http://new/{index}", now=now)
+        scheduler.save()
+        negative = NegativeCache(cache_path, save_path=cache)
+        if index == 0:
+            negative.record_success("https://a/dead")
+        else:
+            negative.record_failure("https://b/dead", now=now)
+            negative.record_failure("https://b/new", now=now)
+        negative.save()
+
+    merge_shards([str(p) for p in paths], state_path=state_path, cache_path=cache_path)
+
+    merged = RecrawlScheduler(state_path)
+    assert merged.cached_url("https://a/1") == "http://new/0"
+    assert merged.cached_url("https://b/1") == "http://new/1"
+    cache = NegativeCache(cache_path)
+    assert "https://a/dead" not in cache.urls
+    assert cache.urls["https://b/dead"]["failures"] == 2
+    assert "https://b/new" in cache.urls
+    # Shard files are consumed so a second merge can't undo the first
+    assert not any(p.exists() for path in paths for p in shard_state_paths(path))
+
+
+def test_merge_without_shard_state_leaves_files_alone(tmp_path):
+    state_path = tmp_path / "recrawl_state.json"
+    paths = [write_partial(tmp_path / "shards", 0, 1, [])]
+    merge_shards([str(p) for p in paths], state_path=state_path, cache_path=tmp_path / "dead.json")
+    assert not state_path.exists()
+
+
+@pytest.fixture(scope="module")
+def single_process(iptvcat, tmp_path_factory):
+    code = ("import json; from scraper import IPTVCatScraper; "
+            "print(json.dumps(IPTVCatScraper().scrape(max_pages=5)))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=tmp_path_factory.mktemp("single"),
+                         capture_output=True, text=True, check=True,
+                         env=dict(os.environ, PYTHONPATH=str(REPO)))
+    return json.loads(out.stdout)
+
+
+def summary(channels):
+    return [(ch["name"], ch["stream_url"], ch["detail_link"], ch["order"]) for ch in channels]
+
+
+@pytest.mark.parametrize("by", ["pages", "links"])
+def test_sharded_scrape_matches_single_process(single_process, tmp_path, monkeypatch, by):
+    # Star Plus HD (page 2) resolves to Star Plus's stream and is dropped; Zee TV is offline
+    assert [ch["name"] for ch in single_process] == ["Star Plus", "Aaj Tak", "Colors"]
+    monkeypatch.chdir(tmp_path)
+    channels, observed = run_local(2, by=by, max_pages=5)
+    assert summary(channels) == summary(single_process)
+    assert len(observed) == 6
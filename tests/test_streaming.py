@@ -0,0 +1,43 @@
+import pytest
+
+from generator import PlaylistGenerator
+
+CHANNEL = {"name": "Aaj Tak", "stream_url": "https://cdn.example.com/b/index.m3u8",
+           "category": "News", "logo": "", "is_online": True}
+
+
+def published(tmp_path):
+    return sorted(p.name for p in tmp_path.iterdir())
+
+
+def test_successful_run_replaces_outputs(tmp_path):
+    gen = PlaylistGenerator(output_dir=tmp_path)
+    summary = gen.generate_streaming([CHANNEL])
+    assert summary["total"] == 1
+    assert published(tmp_path) == ["channels.json", "india_iptv.m3u", "india_news.m3u"]
+    assert "Aaj Tak" in (tmp_path / "india_iptv.m3u").read_text()
+
+
+def test_empty_run_keeps_previous_outputs(tmp_path):
+    gen = PlaylistGenerator(output_dir=tmp_path)
+    gen.generate_streaming([CHANNEL])
+    before = (tmp_path / "channels.json").read_text()
+
+    assert gen.generate_streaming([])["total"] == 0
+    assert (tmp_path / "channels.json").read_text() == before
+    assert published(tmp_path) == ["channels.json", "india_iptv.m3u", "india_news.m3u"]
+
+
+def test_failed_run_keeps_previous_outputs(tmp_path):
+    gen = PlaylistGenerator(output_dir=tmp_path)
+    gen.generate_streaming([CHANNEL])
+    before = (tmp_path / "india_iptv.m3u").read_text()
+
+    def crawl():
+        yield dict(CHANNEL, name="Half Written")
+        raise ConnectionError("listing page failed")
+
+    with pytest.raises(ConnectionError):
+        gen.generate_streaming(crawl())
+    assert (tmp_path / "india_iptv.m3u").read_text() == before
+    assert published(tmp_path) == ["channels.json", "india_iptv.m3u", "india_news.m3u"]
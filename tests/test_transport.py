@@ -0,0 +1,26 @@
+import socket
+
+from scraper import IPTVCatScraper
+
+
+def test_scrapers_share_one_dns_patch():
+    original = socket.getaddrinfo
+    a = IPTVCatScraper()
+    b = IPTVCatScraper()
+    try:
+        assert a.transport.dns is b.transport.dns
+        assert a.transport.dns._original is original
+    finally:
+        a.close()
+    # b still uses the cache after a is closed
+    assert socket.getaddrinfo == b.transport.dns.getaddrinfo
+    b.close()
+    assert socket.getaddrinfo is original
+
+
+def test_close_is_idempotent():
+    original = socket.getaddrinfo
+    with IPTVCatScraper() as scraper:
+        pass
+    scraper.close()
+    assert socket.getaddrinfo is original
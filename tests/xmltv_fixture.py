@@ -0,0 +1,48 @@
+"""
+Synthetic XMLTV guides for EPG tests and memory measurements. Programmes
+are written as they are generated, so the guide can be far larger than
+the memory of the process that writes it.
+
+Usage:
+  python tests/xmltv_fixture.py guide.xml.gz --programmes 1000000 [--channels 500]
+"""
+
+import argparse
+import gzip
+from datetime import datetime, timedelta, timezone
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+SLOT = timedelta(minutes=30)
+
+
+def xmltv_time(dt):
+    return dt.strftime("%Y%m%d%H%M%S +0000")
+
+
+def write_guide(path, programmes, channels=100):
+    """Write a guide with programmes spread round-robin over channels"""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<tv>\n')
+        for c in range(channels):
+            f.write(f'  <channel id="ch{c}.in"><display-name>Channel {c}</display-name></channel>\n')
+        for i in range(programmes):
+            start = START + SLOT * (i // channels)
+            f.write(f'  <programme channel="ch{i % channels}.in" start="{xmltv_time(start)}" '
+                    f'stop="{xmltv_time(start + SLOT)}"><title>Show {i}</title>'
+                    f'<desc>Episode {i} of a long-running programme.</desc></programme>\n')
+        f.write("</tv>\n")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic XMLTV guide")
+    parser.add_argument("path", help="Output file (.xml or .xml.gz)")
+    parser.add_argument("--programmes", type=int, default=100000, help="Number of programmes")
+    parser.add_argument("--channels", type=int, default=100, help="Number of channels")
+    args = parser.parse_args()
+    write_guide(args.path, args.programmes, args.channels)
+
+
+if __name__ == "__main__":
+    main()
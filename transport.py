@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+HTTP Transport Layer
+Shared session setup for scraping: per-host connection pools with
+keep-alive, an in-process DNS cache, optional HTTP/2 and counters for
+new vs reused connections
+"""
+
+import socket
+import logging
+import threading
+import time
+
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import PoolManager
+from urllib3.connection import HTTPConnection
+
+logger = logging.getLogger(__name__)
+
+# ─── Configuration ────────────────────────────────────────────────────────────
+
+DEFAULT_POOL_MAXSIZE = 10      # keep-alive connections per host
+DEFAULT_POOL_HOSTS = 100       # host pools kept before the least recent is dropped
+DEFAULT_DNS_TTL = 300          # seconds
+
+KEEPALIVE_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+
+
+# ─── DNS Cache ────────────────────────────────────────────────────────────────
+
+class DNSCache:
+    """
+    Process-wide getaddrinfo cache with a TTL. Embed hosts are looked up once
+    per run instead of once per connection.
+    """
+
+    def __init__(self, ttl=DEFAULT_DNS_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._original = None
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+        result = self._original(host, port, family, type, proto, flags)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = (now + self.ttl, result)
+        return result
+
+    def install(self):
+        if self._original is None:
+            self._original = socket.getaddrinfo
+            socket.getaddrinfo = self.getaddrinfo
+        return self
+
+    def uninstall(self):
+        if self._original is not None:
+            socket.getaddrinfo = self._original
+            self._original = None
+
+
+_dns_lock = threading.Lock()
+_dns_cache = None
+_dns_users = 0
+
+
+def acquire_dns_cache(ttl=DEFAULT_DNS_TTL):
+    """
+    The process-wide DNSCache, installed on first use. socket.getaddrinfo is
+    patched once no matter how many transports exist; the first ttl wins.
+    """
+    global _dns_cache, _dns_users
+    with _dns_lock:
+        if _dns_cache is None:
+            _dns_cache = DNSCache(ttl=ttl).install()
+        _dns_users += 1
+        return _dns_cache
+
+
+def release_dns_cache():
+    """Drop one user of the shared cache; the last one restores socket.getaddrinfo"""
+    global _dns_cache, _dns_users
+    with _dns_lock:
+        _dns_users = max(_dns_users - 1, 0)
+        if _dns_users == 0 and _dns_cache is not None:
+            _dns_cache.uninstall()
+            _dns_cache = None
+
+
+# ─── Pacing ───────────────────────────────────────────────────────────────────
+
+class HostPacer:
+    """Spaces out request starts per host, across every thread that shares it"""
+
+    def __init__(self):
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url, interval):
+        """Block until a request to url's host may start, then reserve the next slot"""
+        host = urlparse(url).hostname or ""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + interval
+        if start > now:
+            time.sleep(start - now)
+
+
+# ─── Connection Pools ─────────────────────────────────────────────────────────
+
+class HostSizedPoolManager(PoolManager):
+    """PoolManager that sizes each host's pool from a host→maxsize map and remembers every pool"""
+
+    def __init__(self, *args, host_pool_sizes=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.host_pool_sizes = host_pool_sizes or {}
+        self.created_pools = []
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        request_context = dict(request_context or self.connection_pool_kw)
+        size = self.host_pool_sizes.get(host)
+        if size:
+            request_context["maxsize"] = size
+        pool = super()._new_pool(scheme, host, port, request_context=request_context)
+        self.created_pools.append(pool)
+        return pool
+
+
+class PooledAdapter(HTTPAdapter):
+    def __init__(self, host_pool_sizes=None, **kwargs):
+        self.host_pool_sizes = host_pool_sizes or {}
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        pool_kwargs.setdefault("socket_options", KEEPALIVE_SOCKET_OPTIONS)
+        self.poolmanager = HostSizedPoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            host_pool_sizes=self.host_pool_sizes,
+            **pool_kwargs,
+        )
+
+    def connection_stats(self):
+        """{host: (new_connections, requests)} across every pool this adapter created"""
+        stats = {}
+        for pool in self.poolmanager.created_pools:
+            new, total = stats.get(pool.host, (0, 0))
+            stats[pool.host] = (new + pool.num_connections, total + pool.num_requests)
+        return stats
+
+
+# ─── Transport ────────────────────────────────────────────────────────────────
+
+class Transport:
+    def __init__(self, headers=None, proxies=None, http2=False, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 host_pool_sizes=None, dns_ttl=DEFAULT_DNS_TTL):
+        self.dns = acquire_dns_cache(dns_ttl) if dns_ttl else None
+        self.adapter = None
+        self.http2 = False
+
+        if http2:
+            self.session = self._httpx_client(headers, proxies, pool_maxsize)
+        if not self.http2:
+            self.session = requests.Session()
+            self.adapter = PooledAdapter(
+                host_pool_sizes=host_pool_sizes,
+                pool_connections=DEFAULT_POOL_HOSTS,
+                pool_maxsize=pool_maxsize,
+            )
+            self.session.mount("http://", self.adapter)
+            self.session.mount("https://", self.adapter)
+            self.session.headers.update(headers or {})
+            if proxies:
+                self.session.proxies = proxies
+
+    def _httpx_client(self, headers, proxies, pool_maxsize):
+        try:
+            import httpx
+            import h2  # noqa: F401 - httpx needs it for http2=True
+        except ImportError:
+            logger.warning("HTTP/2 needs httpx[http2] (pip install 'httpx[http2]') - using HTTP/1.1")
+            return None
+        proxy = (proxies or {}).get("https") or (proxies or {}).get("http")
+        self.http2 = True
+        logger.info("Transport: HTTP/2 enabled via httpx")
+        return httpx.Client(
+            http2=True,
+            headers=headers,
+            proxy=proxy,
+            follow_redirects=True,
+            limits=httpx.Limits(max_keepalive_connections=pool_maxsize * 4,
+                                max_connections=pool_maxsize * 8),
+        )
+
+    def stats(self):
+        """Connection and DNS counters for this transport"""
+        result = {"http2": self.http2}
+        if self.adapter is not None:
+            per_host = self.adapter.connection_stats()
+            new = sum(n for n, _ in per_host.values())
+            requests_made = sum(r for _, r in per_host.values())
+            result.update({
+                "hosts": len(per_host),
+                "requests": requests_made,
+                "new_connections": new,
+                "reused_connections": max(requests_made - new, 0),
+                "per_host": per_host,
+            })
+        if self.dns is not None:
+            result.update({"dns_hits": self.dns.hits, "dns_misses": self.dns.misses})
+        return result
+
+    def log_stats(self):
+        st = self.stats()
+        if "requests" in st:
+            logger.info(f"Transport: {st['requests']} requests to {st['hosts']} hosts, "
+                        f"{st['new_connections']} new / {st['reused_connections']} reused connections")
+        if "dns_hits" in st:
+            logger.info(f"Transport: DNS cache {st['dns_hits']} hits / {st['dns_misses']} misses")
+        return st
+
+    def close(self):
+        self.session.close()
+        if self.dns is not None:
+            release_dns_cache()
+            self.dns = None